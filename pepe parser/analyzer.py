@@ -1,122 +1,1068 @@
+import hashlib
+import heapq
+import itertools
 import json
 import math
+import os
+import pickle
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from json_io import (COLUMNAR_SCHEMA_FILE, COLUMNAR_SUFFIX, check_compression, file_sha256, is_json_lines,
+                     iter_json_records, open_json_file, output_patterns, output_stem, output_suffix,
+                     temporary_path, write_json_atomic)
 
-def perform_abc_xyz_analysis(json_file_path, output_file_name="abc_xyz_result.json"):
+def _columnar_path(json_file_path):
+    """
+    Возвращает папку колоночных данных для JSON файла или None, если ее нет
+    или она устарела (JSON перезаписан позже колоночной версии)
+    """
+    json_path = Path(json_file_path)
+    columns_path = json_path.with_name(output_stem(json_path) + COLUMNAR_SUFFIX)
+    schema_path = columns_path / COLUMNAR_SCHEMA_FILE
+    if not schema_path.exists():
+        return None
+    if json_path.exists() and json_path.stat().st_mtime > schema_path.stat().st_mtime:
+        return None
+    return columns_path
+
+def _load_columnar(columns_path):
+    """
+    Открывает колоночные данные (.npy на столбец + schema.json)
+    
+    Массивы открываются через memory mapping, поэтому чтение не требует
+    разбора текста и копирования файла в память целиком; значения
+    читаются только из тех столбцов и строк, которые использует анализ.
+    
+    Args:
+        columns_path (Path): Папка с файлами столбцов
+    
+    Returns:
+        dict: {'layout': 'typed' или None, 'rows': число строк, 'columns':
+            имя столбца -> описание из схемы с массивом 'values' (и 'strings'
+            у столбцов mixed)}
+    """
+    import numpy as np
+    
+    with open(columns_path / COLUMNAR_SCHEMA_FILE, 'r', encoding='utf-8') as f:
+        schema = json.load(f)
+    
+    columns = {}
+    for column in schema['columns']:
+        column = dict(column, values=np.load(columns_path / column['file'], mmap_mode='r'))
+        if column['kind'] == 'mixed':
+            column['strings'] = np.load(columns_path / column['strings_file'], mmap_mode='r')
+        columns[column['name']] = column
+    
+    return {'layout': schema.get('layout'), 'rows': schema['rows'], 'columns': columns}
+
+def _column_cells(table, column, rows=None):
+    """
+    Значения столбца колоночных данных списком Python - такие же, как в
+    JSON версии файла (None вместо пустых ячеек)
+    
+    Args:
+        table (dict): Колоночные данные (см. _load_columnar)
+        column (dict): Описание столбца из table['columns']
+        rows (ndarray): Номера нужных строк (по умолчанию - все)
+    """
+    values = column['values'] if rows is None else column['values'][rows]
+    cells = values.tolist()
+    
+    if column['kind'] == 'string':
+        if table['layout'] != 'typed':
+            # В исходном формате '' означает пустую ячейку
+            cells = [value or None for value in cells]
+    else:
+        if values.dtype.kind == 'f':
+            cells = [None if value != value else value for value in cells]
+        if column['kind'] == 'mixed':
+            strings = column['strings'] if rows is None else column['strings'][rows]
+            cells = [text or value for value, text in zip(cells, strings.tolist())]
+    
+    return cells
+
+def _columnar_records(table):
+    """
+    Записи (dict) колоночных данных - для движка 'loop', работающего со
+    словарями; движок 'numpy' использует массивы (см. _columnar_arrays)
+    """
+    names = list(table['columns'])
+    columns = [_column_cells(table, column) for column in table['columns'].values()]
+    return [dict(zip(names, row)) for row in zip(*columns)]
+
+def _numeric_column(table, name, rows):
+    """
+    Числовые значения столбца для строк rows (0, если столбца нет - как
+    значение по умолчанию в _normalize_record)
+    """
+    import numpy as np
+    
+    column = table['columns'].get(name)
+    if column is None:
+        return np.zeros(len(rows))
+    values = column['values'][rows]
+    if column['kind'] == 'string' or (values.dtype.kind == 'f' and np.isnan(values).any()):
+        raise ValueError(f"Столбец '{name}' содержит пустые или нечисловые значения")
+    return values
+
+def _columnar_arrays(table, period_columns=None, group_by=None):
+    """
+    Нормализует колоночные данные в массивы (аналог _normalize_items без
+    создания записей): в исходном формате остаются строки с числовым №,
+    в типизированном - все строки
+    
+    Args:
+        table (dict): Колоночные данные (см. _load_columnar)
+        period_columns: Столбцы периодов исходного формата (см. _period_columns)
+        group_by (list): Столбцы группировки
+    
+    Returns:
+        dict: {'id', 'revenue', 'quarters' (N x число периодов),
+            'group_index' (или None) - массивы NumPy; 'name' - список
+            наименований; 'groups' - ключи групп по номерам}
+    """
+    import numpy as np
+    
+    columns = table['columns']
+    if table['layout'] == 'typed':
+        rows = np.arange(table['rows'])
+        id_name, name_name, revenue_name = 'id', 'name', 'revenue'
+        quarters = np.asarray(columns['quarters']['values'], dtype='float64')
+    else:
+        id_column = columns.get(ID_COLUMN)
+        if id_column is None or id_column['kind'] == 'string':
+            rows = np.arange(0)
+        else:
+            # Фильтрация данных - оставляем только строки с числовым ID
+            ids = id_column['values']
+            rows = np.flatnonzero(~np.isnan(ids)) if ids.dtype.kind == 'f' else np.arange(len(ids))
+        id_name, name_name, revenue_name = ID_COLUMN, NAME_COLUMN, REVENUE_COLUMN
+        periods = _period_columns(columns, period_columns)
+        quarters = np.empty((len(rows), len(periods)))
+        for index, name in enumerate(periods):
+            quarters[:, index] = _numeric_column(table, name, rows)
+    
+    name_column = columns.get(name_name)
+    arrays = {
+        'id': columns[id_name]['values'][rows] if len(rows) else np.zeros(0),
+        'name': _column_cells(table, name_column, rows) if name_column else [''] * len(rows),
+        'revenue': _numeric_column(table, revenue_name, rows),
+        'quarters': quarters,
+        'group_index': None,
+        'groups': [None]
+    }
+    
+    if group_by:
+        _check_group_columns(columns, group_by)
+        cells = [_column_cells(table, columns[name], rows) for name in group_by]
+        indexes = {}
+        arrays['group_index'] = np.fromiter(
+            (indexes.setdefault(key, len(indexes)) for key in zip(*cells)), dtype='int64', count=len(rows))
+        arrays['groups'] = list(indexes)
+    
+    return arrays
+
+def _load_records(json_file_path):
+    """
+    Загружает записи из JSON файла (массив объектов) или JSON Lines (.jsonl);
+    сжатые файлы (.gz, .xz) распаковываются потоком при чтении
+    
+    Если рядом с файлом есть колоночная версия данных (<имя>.columns),
+    используется она - это значительно быстрее разбора JSON.
+    
+    Args:
+        json_file_path (str): Путь к файлу с данными
+    
+    Returns:
+        list: Список записей (dict)
+    """
+    columns_path = _columnar_path(json_file_path)
+    if columns_path is not None:
+        print(f"Используется колоночный формат: {columns_path.name}")
+        return _columnar_records(_load_columnar(columns_path))
+    
+    with open_json_file(json_file_path, 'r') as f:
+        if is_json_lines(json_file_path):
+            return [json.loads(line) for line in f if line.strip()]
+        return json.load(f)
+
+# Столбцы исходного (нетипизированного) формата парсера
+ID_COLUMN = '№'
+NAME_COLUMN = 'Наименование товара'
+REVENUE_COLUMN = 'Выручка (У.Е.)'
+QUARTER_COLUMNS = ('Выручка по кварталам (У.Е.)', 'Unnamed: 4', 'Unnamed: 5', 'Unnamed: 6')
+
+# Что анализ использует из исходного формата парсера: только эти столбцы и
+# только строки с числовым №. Передается парсеру (projection=...), чтобы он
+# не читал и не сохранял остальные столбцы и строки широких книг.
+ANALYSIS_PROJECTION = {
+    'columns': [ID_COLUMN, NAME_COLUMN, REVENUE_COLUMN, *QUARTER_COLUMNS],
+    'numeric_columns': [ID_COLUMN]
+}
+
+def analysis_projection(group_by=None):
+    """
+    Проекция для парсера с учетом группировки: ANALYSIS_PROJECTION и столбцы
+    group_by в 'keep_columns' - парсер сохраняет их и в типизированной схеме
+    
+    Args:
+        group_by (str/list): Столбцы группировки (см. perform_abc_xyz_analysis)
+    
+    Returns:
+        dict: Проекция для xls_to_json_batch(projection=...)
+    """
+    group_by = _check_group_by(group_by)
+    if not group_by:
+        return ANALYSIS_PROJECTION
+    return dict(ANALYSIS_PROJECTION, keep_columns=group_by)
+
+def _period_columns(item, period_columns):
+    """
+    Столбцы периодов исходного формата: QUARTER_COLUMNS по умолчанию,
+    все столбцы после столбца выручки ('auto') или заданный список
+    """
+    if period_columns is None:
+        return QUARTER_COLUMNS
+    if period_columns == 'auto':
+        columns = list(item)
+        return tuple(columns[columns.index(REVENUE_COLUMN) + 1:]) if REVENUE_COLUMN in columns else ()
+    return tuple(period_columns)
+
+def _normalize_items(data, period_columns=None, group_by=None):
+    """
+    Приводит записи к единому виду {'id', 'name', 'revenue', 'quarters'}
+    
+    Типизированные записи парсера (typed_schema=True) уже имеют этот вид и
+    не требуют фильтрации. В исходном формате остаются только записи с
+    числовым №, а значения по периодам берутся из столбцов period_columns.
+    
+    Args:
+        data (list): Записи из файла с данными
+        period_columns: Столбцы периодов исходного формата (см. _period_columns)
+        group_by (list): Столбцы группировки; значения сохраняются в ключе 'group'
+    
+    Returns:
+        list: Нормализованные записи
+    """
+    if data and group_by:
+        _check_group_columns(data[0], group_by)
+    if data and _is_normalized(data[0]):
+        if group_by:
+            for item in data:
+                item['group'] = _group_values(item, group_by)
+        return data
+    
+    columns = _period_columns(data[0], period_columns) if data else ()
+    # Фильтрация данных - оставляем только элементы с числовым ID
+    return [
+        _normalize_record(item, columns, group_by)
+        for item in data
+        if isinstance(item.get(ID_COLUMN), (int, float))
+    ]
+
+def _is_normalized(item):
+    """
+    Запись уже в нормализованном виде (типизированный формат парсера)
+    """
+    return isinstance(item, dict) and 'quarters' in item and 'revenue' in item
+
+def _iter_normalized(records, period_columns=None):
+    """
+    Нормализует записи по одной (потоковый вариант _normalize_items)
+    """
+    columns = None
+    for item in records:
+        if _is_normalized(item):
+            yield item
+            continue
+        if columns is None:
+            columns = _period_columns(item, period_columns)
+        if isinstance(item.get(ID_COLUMN), (int, float)):
+            # Фильтрация данных - оставляем только элементы с числовым ID
+            yield _normalize_record(item, columns)
+
+def _normalize_record(item, period_columns=QUARTER_COLUMNS, group_by=None):
+    """
+    Нормализованная запись из записи исходного формата парсера
+    """
+    normalized = {
+        'id': item.get(ID_COLUMN),
+        'name': item.get(NAME_COLUMN, ''),
+        'revenue': item.get(REVENUE_COLUMN, 0),
+        'quarters': [item.get(column, 0) for column in period_columns]
+    }
+    if group_by:
+        normalized['group'] = _group_values(item, group_by)
+    return normalized
+
+def _check_group_by(group_by):
+    """
+    Приводит group_by к списку столбцов группировки (None - без группировки)
+    """
+    if group_by is None:
+        return None
+    columns = [group_by] if isinstance(group_by, str) else list(group_by)
+    if not columns or not all(isinstance(column, str) for column in columns):
+        raise ValueError("group_by должен быть именем столбца или списком имен столбцов")
+    return columns
+
+def _check_group_columns(columns, group_by):
+    """
+    Проверяет, что столбцы группировки есть в данных (columns - запись или
+    имена столбцов); без них все записи попали бы в одну группу
+    """
+    missing = [column for column in group_by if column not in columns]
+    if missing:
+        raise ValueError(f"В данных нет столбцов группировки: {', '.join(missing)} (для данных "
+                         f"парсера используйте projection=analysis_projection(group_by))")
+
+def _group_values(item, group_by):
+    """
+    Значения столбцов группировки записи (ключ группы)
+    """
+    return tuple(item.get(column) for column in group_by)
+
+def _index_groups(items):
+    """
+    Нумерует группы записей в порядке первого появления (ключ 'group_index')
+    
+    Returns:
+        list: Ключи групп по номерам
+    """
+    indexes = {}
+    for item in items:
+        item['group_index'] = indexes.setdefault(item['group'], len(indexes))
+    return list(indexes)
+
+def _group_segments(items, grouped):
+    """
+    Границы (начало, конец) отрезков одной группы в отсортированных записях;
+    без группировки - один отрезок на все записи
+    """
+    if not grouped:
+        yield 0, len(items)
+        return
+    start = 0
+    for _, run in itertools.groupby(item['group_index'] for item in items):
+        end = start + sum(1 for _ in run)
+        yield start, end
+        start = end
+
+def _warn_empty_groups(count):
+    if count:
+        print(f"⚠ Групп с нулевой общей выручкой: {count} - их товары отнесены к классу C")
+
+# Ячейки матрицы ABC-XYZ в порядке листов отчета Excel
+ABC_XYZ_CELLS = [abc + xyz for abc in 'ABC' for xyz in 'XYZ']
+
+# Столбцы листов отчета Excel: (ключ записи результата, заголовок)
+REPORT_COLUMNS = (
+    ('id', ID_COLUMN),
+    ('name', NAME_COLUMN),
+    ('revenue', REVENUE_COLUMN),
+    ('ABC', 'ABC'),
+    ('XYZ', 'XYZ')
+)
+
+class _AnalysisStats:
+    """
+    Статистика результата анализа, накапливаемая по одной записи:
+    распределения ABC, XYZ, матрица ABC-XYZ и выручка по ячейкам матрицы
+    """
+    
+    def __init__(self):
+        self.abc = {}
+        self.xyz = {}
+        self.abc_xyz = {}
+        self.revenue = {}
+        self.total_revenue = 0
+    
+    def add(self, item):
+        self.abc[item['ABC']] = self.abc.get(item['ABC'], 0) + 1
+        self.xyz[item['XYZ']] = self.xyz.get(item['XYZ'], 0) + 1
+        self.abc_xyz[item['ABC_XYZ']] = self.abc_xyz.get(item['ABC_XYZ'], 0) + 1
+        self.revenue[item['ABC_XYZ']] = self.revenue.get(item['ABC_XYZ'], 0) + item['revenue']
+        self.total_revenue += item['revenue']
+    
+    def to_dict(self):
+        return {'abc': self.abc, 'xyz': self.xyz, 'abc_xyz': self.abc_xyz,
+                'revenue': self.revenue, 'total_revenue': self.total_revenue}
+    
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.abc = data['abc']
+        stats.xyz = data['xyz']
+        stats.abc_xyz = data['abc_xyz']
+        stats.revenue = data['revenue']
+        stats.total_revenue = data['total_revenue']
+        return stats
+    
+    def print_summary(self):
+        print("\nСтатистика анализа:")
+        print(f"ABC распределение: {self.abc}")
+        print(f"XYZ распределение: {self.xyz}")
+        print(f"ABC-XYZ матрица: {self.abc_xyz}")
+    
+    def summary_rows(self):
+        """
+        Строки сводного листа отчета: по ячейкам матрицы, затем итоги по ABC и XYZ
+        """
+        yield ['Группа', 'Число товаров', REVENUE_COLUMN, 'Доля выручки, %']
+        for cell in ABC_XYZ_CELLS:
+            revenue = self.revenue.get(cell, 0)
+            share = revenue / self.total_revenue * 100 if self.total_revenue else 0
+            yield [cell, self.abc_xyz.get(cell, 0), revenue, round(share, 2)]
+        yield ['Итого', sum(self.abc_xyz.values()), self.total_revenue, 100 if self.total_revenue else 0]
+        yield []
+        yield ['ABC', 'Число товаров']
+        for group in 'ABC':
+            yield [group, self.abc.get(group, 0)]
+        yield []
+        yield ['XYZ', 'Число товаров']
+        for group in 'XYZ':
+            yield [group, self.xyz.get(group, 0)]
+
+# Границы классов: ABC - накопленная доля выручки (%), XYZ - коэффициент вариации (%)
+ABC_THRESHOLDS = (80, 95)
+XYZ_THRESHOLDS = (15, 25)
+
+# Допуск сравнения коэффициента вариации с границами XYZ: CV, посчитанный
+# разными способами (Уэлфорд, два прохода), расходится в последних битах,
+# и значение ровно на границе (25.000000000000007 вместо 25.0) не должно
+# менять класс
+XYZ_CV_TOLERANCE = 1e-9
+
+# Движки классификации: циклы Python по записям, массивы NumPy или
+# внешняя сортировка слиянием (записи не загружаются в память целиком)
+ANALYSIS_ENGINES = ('loop', 'numpy', 'external')
+
+# Внешняя сортировка: записей в одной отсортированной порции на диске (run),
+# порций в одном слиянии и записей в одном блоке pickle внутри порции
+EXTERNAL_RUN_SIZE = 100000
+MERGE_FAN_IN = 64
+RUN_BATCH_SIZE = 1024
+
+def _xyz_bounds():
+    """
+    Границы XYZ с допуском XYZ_CV_TOLERANCE: класс X - CV не больше первой,
+    Y - не больше второй
+    """
+    return tuple(threshold + XYZ_CV_TOLERANCE for threshold in XYZ_THRESHOLDS)
+
+def _abc_class(percentage):
+    """
+    Класс ABC по накопленной доле выручки (%)
+    """
+    if percentage <= ABC_THRESHOLDS[0]:
+        return 'A'
+    elif percentage <= ABC_THRESHOLDS[1]:
+        return 'B'
+    return 'C'
+
+class RunningVariance:
+    """
+    Среднее и дисперсия выручки по периодам за один проход (алгоритм Уэлфорда)
+    
+    Значения периодов не хранятся: состояние - число периодов, среднее и
+    сумма квадратов отклонений, поэтому история любой длины (52-156 недель
+    и больше) может подаваться по одному значению. Алгоритм численно
+    устойчив (нет вычитания больших близких сумм), а состояния, накопленные
+    по частям данных, объединяются (merge, формула Чана).
+    """
+    __slots__ = ('count', 'mean', 'm2')
+    
+    def __init__(self, count=0, mean=0.0, m2=0.0):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+    
+    def add(self, value):
+        """
+        Добавляет значение очередного периода
+        """
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+    
+    def update(self, values):
+        """
+        Добавляет значения нескольких периодов
+        """
+        count, mean, m2 = self.count, self.mean, self.m2
+        for value in values:
+            count += 1
+            delta = value - mean
+            mean += delta / count
+            m2 += delta * (value - mean)
+        self.count, self.mean, self.m2 = count, mean, m2
+        return self
+    
+    def merge(self, other):
+        """
+        Объединяет с состоянием по другой части периодов
+        """
+        count = self.count + other.count
+        if count:
+            delta = other.mean - self.mean
+            self.m2 += other.m2 + delta * delta * self.count * other.count / count
+            self.mean += delta * other.count / count
+            self.count = count
+        return self
+    
+    @property
+    def variance(self):
+        # Дисперсия генеральной совокупности (деление на число периодов)
+        return self.m2 / self.count if self.count else 0
+    
+    def cv(self):
+        """
+        Коэффициент вариации (%); 100, если среднее не больше 0
+        """
+        if self.mean > 0:
+            return (math.sqrt(self.variance) / self.mean) * 100
+        return 100  # Если среднее равно 0, считаем максимальную нестабильность
+    
+    def xyz_class(self):
+        """
+        Класс XYZ по коэффициенту вариации (с допуском, см. _xyz_bounds)
+        """
+        cv = self.cv()
+        bounds = _xyz_bounds()
+        if cv <= bounds[0]:
+            return 'X'
+        elif cv <= bounds[1]:
+            return 'Y'
+        return 'Z'
+
+def _xyz_class(quarters):
+    """
+    Класс XYZ по коэффициенту вариации выручки по периодам
+    """
+    return RunningVariance().update(quarters).xyz_class()
+
+def period_variances(rows, periods=None):
+    """
+    Статистика XYZ по потоку строк (товар, период, выручка) за один проход
+    
+    Для каждого товара хранится только RunningVariance, а не история
+    периодов. Периоды без строки у товара считаются нулевыми: после прохода
+    состояние дополняется нулями до общего числа периодов.
+    
+    Args:
+        rows (iterable): Кортежи (ID товара, период, выручка); пара
+            (товар, период) встречается не больше одного раза
+        periods (int): Общее число периодов (по умолчанию - число разных
+            периодов в строках)
+    
+    Returns:
+        dict: ID товара -> RunningVariance
+    """
+    stats = {}
+    seen_periods = set()
+    for item_id, period, value in rows:
+        state = stats.get(item_id)
+        if state is None:
+            state = stats[item_id] = RunningVariance()
+        state.add(value)
+        seen_periods.add(period)
+    
+    periods = len(seen_periods) if periods is None else periods
+    for state in stats.values():
+        if state.count < periods:
+            state.merge(RunningVariance(periods - state.count))
+    return stats
+
+def _classify_loop(items, grouped=False):
+    """
+    ABC-XYZ классификация циклами Python по записям
+    
+    Args:
+        items (list): Нормализованные записи
+        grouped (bool): ABC внутри групп (ключ 'group_index', см. _index_groups)
+    
+    Returns:
+        list: Записи, отсортированные по убыванию выручки (при группировке -
+            по группам, внутри группы по убыванию выручки), с ключами 'ABC',
+            'XYZ' и 'ABC_XYZ', или None, если общая выручка не больше 0
+    """
+    # ABC анализ (по выручке): одна сортировка и один проход по отрезкам групп
+    if grouped:
+        items.sort(key=lambda x: (x['group_index'], -x['revenue']))
+    else:
+        items.sort(key=lambda x: x['revenue'], reverse=True)
+    
+    empty_groups = 0
+    for start, end in _group_segments(items, grouped):
+        segment = items[start:end]
+        total_revenue = sum(i['revenue'] for i in segment)
+        
+        if total_revenue <= 0:
+            if not grouped:
+                return None
+            empty_groups += 1
+            for item in segment:
+                item['ABC'] = 'C'
+            continue
+        
+        cumulative = 0
+        
+        for item in segment:
+            revenue = item['revenue']
+            cumulative += revenue
+            item['ABC'] = _abc_class((cumulative / total_revenue) * 100)
+    _warn_empty_groups(empty_groups)
+    
+    # XYZ анализ (по стабильности продаж по кварталам)
+    for item in items:
+        item['XYZ'] = _xyz_class(item['quarters'])
+        item['ABC_XYZ'] = item['ABC'] + item['XYZ']
+    
+    return items
+
+def _running_stats(matrix):
+    """
+    Среднее и дисперсия строк матрицы алгоритмом Уэлфорда по столбцам - в
+    том же порядке операций, что и RunningVariance, поэтому классы XYZ
+    совпадают с движком 'loop' до последнего бита
+    """
+    import numpy as np
+    
+    mean = np.zeros(matrix.shape[0])
+    m2 = np.zeros(matrix.shape[0])
+    for column in range(matrix.shape[1]):
+        values = matrix[:, column]
+        delta = values - mean
+        mean = mean + delta / (column + 1)
+        m2 = m2 + delta * (values - mean)
+    return mean, m2 / matrix.shape[1]
+
+def _cv_array(avg, variance):
+    """
+    Коэффициенты вариации (%) по массивам среднего и дисперсии; 100, если
+    среднее не больше 0 (как RunningVariance.cv)
+    """
+    import numpy as np
+    
+    positive = avg > 0
+    cv = np.full(len(avg), 100.0)
+    cv[positive] = (np.sqrt(variance[positive]) / avg[positive]) * 100
+    return cv
+
+def _classify_arrays(revenue, quarters, group_index=None):
+    """
+    ABC-XYZ классификация на массивах NumPy (ядро движка 'numpy')
+    
+    ABC: устойчивая сортировка по убыванию выручки (argsort), накопленная
+    сумма (cumsum) и границы классов через searchsorted. XYZ: среднее и
+    дисперсия по строкам матрицы N x число периодов за один проход по
+    столбцам (алгоритм Уэлфорда).
+    
+    Args:
+        revenue (ndarray): Выручка записей
+        quarters (ndarray): Матрица N x число периодов
+        group_index (ndarray): Номера групп записей (None - без группировки)
+    
+    Returns:
+        tuple: (order - порядок записей как у _classify_loop, abc и xyz -
+            номера классов 0..2 в этом порядке) или None, если общая выручка
+            не больше 0
+    """
+    import numpy as np
+    
+    revenue = np.asarray(revenue, dtype='float64')
+    if group_index is not None:
+        # lexsort устойчива: группа - первый ключ, выручка по убыванию - второй
+        order = np.lexsort((-revenue, group_index))
+        bounds = (np.flatnonzero(np.diff(group_index[order])) + 1).tolist()
+        edges = [0, *bounds, len(order)] if len(order) else [0, 0]
+    else:
+        order = np.argsort(-revenue, kind='stable')
+        edges = [0, len(order)]
+    revenue = revenue[order]
+    # Общая выручка - встроенной sum() в том же порядке, как в движке 'loop'
+    revenue_list = revenue.tolist()
+    
+    abc = np.empty(len(order), dtype='int64')
+    empty_groups = 0
+    for start, end in zip(edges[:-1], edges[1:]):
+        total_revenue = sum(revenue_list[start:end])
+        if total_revenue <= 0:
+            if group_index is None:
+                return None
+            empty_groups += 1
+            abc[start:end] = 2
+            continue
+        
+        percentage = (np.cumsum(revenue[start:end]) / total_revenue) * 100
+        abc[start:end] = np.searchsorted(ABC_THRESHOLDS, percentage, side='left')
+    _warn_empty_groups(empty_groups)
+    
+    quarters = np.asarray(quarters, dtype='float64')[order]
+    if quarters.shape[1]:
+        avg, variance = _running_stats(quarters)
+    else:
+        avg = variance = np.zeros(len(order))
+    
+    xyz = np.searchsorted(_xyz_bounds(), _cv_array(avg, variance), side='left')
+    return order, abc, xyz
+
+def _class_names(abc, xyz):
+    """
+    Имена классов ABC, XYZ и ячеек матрицы по номерам классов
+    """
+    import numpy as np
+    
+    return (np.array(list('ABC'), dtype=object)[abc].tolist(),
+            np.array(list('XYZ'), dtype=object)[xyz].tolist(),
+            np.array(ABC_XYZ_CELLS, dtype=object)[abc * 3 + xyz].tolist())
+
+def _classify_numpy(items, grouped=False):
+    """
+    ABC-XYZ классификация на массивах NumPy (те же классы, что у _classify_loop)
+    
+    Записи переводятся в массивы, классы считаются в _classify_arrays.
+    
+    Args:
+        items (list): Нормализованные записи
+        grouped (bool): ABC внутри групп (ключ 'group_index', см. _index_groups)
+    
+    Returns:
+        list: Записи в порядке _classify_loop с ключами 'ABC', 'XYZ' и
+            'ABC_XYZ', или None, если общая выручка не больше 0
+    """
+    import numpy as np
+    
+    quarters = [item['quarters'] for item in items]
+    periods = set(map(len, quarters))
+    if len(periods) > 1:
+        print("⚠ Разное число периодов у записей - используется движок 'loop'")
+        return _classify_loop(items, grouped)
+    count = periods.pop() if periods else 0
+    
+    revenue = np.fromiter((item['revenue'] for item in items), dtype='float64', count=len(items))
+    group = None
+    if grouped:
+        group = np.fromiter((item['group_index'] for item in items), dtype='int64', count=len(items))
+    quarters = np.fromiter(itertools.chain.from_iterable(quarters), dtype='float64',
+                           count=len(items) * count).reshape(len(items), count)
+    
+    classified = _classify_arrays(revenue, quarters, group)
+    if classified is None:
+        return None
+    order, abc, xyz = classified
+    
+    items = [items[index] for index in order.tolist()]
+    for item, abc_class, xyz_class, cell in zip(items, *_class_names(abc, xyz)):
+        item['ABC'] = abc_class
+        item['XYZ'] = xyz_class
+        item['ABC_XYZ'] = cell
+    
+    return items
+
+def _classify_columnar(arrays):
+    """
+    Движок 'numpy' для колоночных данных: классы считаются прямо по массивам
+    (см. _columnar_arrays), записи результата создаются по одной при записи
+    
+    Returns:
+        generator: Записи в порядке _classify_loop с ключами 'ABC', 'XYZ',
+            'ABC_XYZ' и 'group_index', или None, если общая выручка не больше 0
+    """
+    classified = _classify_arrays(arrays['revenue'], arrays['quarters'], arrays['group_index'])
+    if classified is None:
+        return None
+    order, abc, xyz = classified
+    
+    def records():
+        order_list = order.tolist()
+        ids = arrays['id'].tolist()
+        revenue = arrays['revenue'].tolist()
+        names = arrays['name']
+        group_index = arrays['group_index'].tolist() if arrays['group_index'] is not None else None
+        for index, abc_class, xyz_class, cell in zip(order_list, *_class_names(abc, xyz)):
+            yield {'id': ids[index], 'name': names[index], 'revenue': revenue[index],
+                   'group_index': group_index[index] if group_index else 0,
+                   'ABC': abc_class, 'XYZ': xyz_class, 'ABC_XYZ': cell}
+    
+    return records()
+
+def _write_run(records, run_path):
+    """
+    Записывает отсортированную порцию записей на диск блоками pickle
+    """
+    with open(run_path, 'wb') as f:
+        for batch in iter(lambda: list(itertools.islice(records, RUN_BATCH_SIZE)), []):
+            pickle.dump(batch, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return run_path
+
+def _read_run(run_path):
+    """
+    Читает записи порции по одному блоку
+    """
+    with open(run_path, 'rb') as f:
+        while True:
+            try:
+                batch = pickle.load(f)
+            except EOFError:
+                return
+            yield from batch
+
+def _run_order(record):
+    # По группе, внутри группы по убыванию выручки, при равной выручке - в
+    # порядке исходного файла (как устойчивая сортировка движка 'loop')
+    return (record[0], -record[1], record[2])
+
+def _merge_runs(run_paths):
+    """
+    Слияние отсортированных порций в один отсортированный поток
+    """
+    return heapq.merge(*[_read_run(path) for path in run_paths], key=_run_order)
+
+def _external_runs(json_file_path, spill_dir, run_size, period_columns=None, group_by=None):
+    """
+    Первый проход внешней сортировки: читает файл потоком, определяет класс
+    XYZ каждой записи и сбрасывает на диск отсортированные порции по
+    run_size записей. Если порций больше MERGE_FAN_IN, они сливаются
+    группами, пока не останется не больше MERGE_FAN_IN.
+    
+    Args:
+        json_file_path (str): Путь к файлу с данными
+        spill_dir (str): Папка для порций
+        run_size (int): Записей в одной порции (ограничивает память)
+        period_columns: Столбцы периодов исходного формата (см. _period_columns)
+        group_by (list): Столбцы группировки
+    
+    Returns:
+        tuple: (пути к порциям, число прочитанных записей, число записей
+            после фильтрации, ключи групп по номерам)
+    """
+    groups = {}
+    loaded = 0
+    count = 0
+    run = []
+    run_paths = []
+    
+    def spill():
+        run.sort(key=_run_order)
+        run_paths.append(_write_run(iter(run), Path(spill_dir) / f"run_{len(run_paths):06d}.pkl"))
+        run.clear()
+    
+    columns = None
+    for item in iter_json_records(json_file_path):
+        loaded += 1
+        if group_by and loaded == 1:
+            _check_group_columns(item, group_by)
+        if not _is_normalized(item):
+            if columns is None:
+                columns = _period_columns(item, period_columns)
+            # Фильтрация данных - оставляем только элементы с числовым ID
+            if not isinstance(item.get(ID_COLUMN), (int, float)):
+                continue
+            item = _normalize_record(item, columns, group_by)
+        elif group_by:
+            item['group'] = _group_values(item, group_by)
+        
+        # (номер группы, выручка, номер записи, ID, наименование, класс XYZ)
+        group_index = groups.setdefault(item.get('group'), len(groups))
+        run.append((group_index, item['revenue'], count, item['id'], item['name'],
+                    _xyz_class(item['quarters'])))
+        count += 1
+        if len(run) >= run_size:
+            spill()
+    if run:
+        spill()
+    
+    level = 0
+    while len(run_paths) > MERGE_FAN_IN:
+        level += 1
+        batches = [run_paths[start:start + MERGE_FAN_IN] for start in range(0, len(run_paths), MERGE_FAN_IN)]
+        merged = []
+        for index, batch in enumerate(batches):
+            merged.append(_write_run(_merge_runs(batch), Path(spill_dir) / f"merge_{level}_{index:06d}.pkl"))
+            for path in batch:
+                os.remove(path)
+        run_paths = merged
+    
+    return run_paths, loaded, count, list(groups)
+
+def _classify_external(run_paths, grouped=False):
+    """
+    ABC-XYZ классификация по отсортированным порциям на диске
+    
+    Общая выручка (при группировке - выручка каждой группы) считается
+    отдельным потоковым проходом по слиянию порций (в том же порядке, что и
+    в движке 'loop', поэтому классы совпадают), затем второй проход по
+    слиянию назначает классы ABC по накопленной доле. В памяти одновременно
+    находится по одному блоку каждой порции и итоги групп.
+    
+    Args:
+        run_paths (list): Пути к порциям (см. _external_runs)
+        grouped (bool): ABC внутри групп
+    
+    Returns:
+        generator: Записи в порядке _classify_loop с ключами 'ABC', 'XYZ',
+            'ABC_XYZ' и 'group_index', или None, если общая выручка не больше 0
+    """
+    totals = {
+        group_index: sum(record[1] for record in records)
+        for group_index, records in itertools.groupby(_merge_runs(run_paths), key=lambda record: record[0])
+    }
+    if not grouped and totals.get(0, 0) <= 0:
+        return None
+    _warn_empty_groups(sum(1 for total in totals.values() if total <= 0))
+    
+    def classified():
+        current = None
+        for group_index, revenue, _, item_id, name, xyz in _merge_runs(run_paths):
+            if group_index != current:
+                current = group_index
+                total_revenue = totals[group_index]
+                cumulative = 0
+            cumulative += revenue
+            abc = _abc_class((cumulative / total_revenue) * 100) if total_revenue > 0 else 'C'
+            yield {'id': item_id, 'name': name, 'revenue': revenue, 'group_index': group_index,
+                   'ABC': abc, 'XYZ': xyz, 'ABC_XYZ': abc + xyz}
+    
+    return classified()
+
+def _result_records(items, stats, group_by=None, groups=None):
+    """
+    Записи результата анализа; статистика накапливается по мере записи.
+    При группировке запись начинается со значений столбцов группировки.
+    """
+    for item in items:
+        stats.add(item)
+        record = dict(zip(group_by, groups[item['group_index']])) if group_by else {}
+        record.update({
+            'id': int(item['id']),
+            'name': item['name'],
+            'revenue': item['revenue'],
+            'ABC': item['ABC'],
+            'XYZ': item['XYZ'],
+            'ABC_XYZ': item['ABC_XYZ']
+        })
+        yield record
+
+# Папка результатов анализа (рядом с файлом данных)
+RESULTS_FOLDER = "analysis_results"
+
+def _results_path(json_file_path):
+    return Path(json_file_path).parent / RESULTS_FOLDER
+
+def perform_abc_xyz_analysis(json_file_path, output_file_name="abc_xyz_result.json", json_profile='pretty',
+                             xlsx_report=False, engine='loop', run_size=EXTERNAL_RUN_SIZE,
+                             period_columns=None, group_by=None, stats=None):
     """
     Выполняет ABC-XYZ анализ на основе JSON файла
     
     Args:
-        json_file_path (str): Путь к JSON файлу с данными
+        json_file_path (str): Путь к JSON или JSON Lines (.jsonl) файлу с данными,
+            в том числе сжатому (.gz, .xz)
         output_file_name (str): Имя выходного файла с результатами анализа
+            (с расширением .gz или .xz результат сжимается)
+        json_profile (str): Профиль вывода: 'pretty', 'compact' или 'jsonl'
+        xlsx_report (bool): Дополнительно сохранить отчет Excel рядом с
+            результатом (см. export_analysis_xlsx)
+        engine (str): Движок классификации: 'loop' (циклы Python),
+            'numpy' (массивы NumPy, быстрее на больших файлах) или 'external'
+            (внешняя сортировка слиянием для файлов, не помещающихся в
+            память); классы у всех движков одинаковые
+        run_size (int): Для движка 'external' - записей в одной порции
+            сортировки; память ограничена примерно run_size записями
+        period_columns: Столбцы периодов для XYZ в исходном формате парсера:
+            None - QUARTER_COLUMNS, 'auto' - все столбцы после столбца
+            выручки (любое число периодов, например 52 недели) или список имен
+        group_by (str/list): Столбец или столбцы группировки (категория, склад,
+            регион): ABC считается внутри каждой группы (свои итоги и
+            накопленные доли) за одну сортировку и один проход по данным;
+            результат упорядочен по группам, записи начинаются со значений
+            столбцов группировки
+        stats (_AnalysisStats): Объект, в который накапливается статистика
+            результата (по умолчанию - новый)
     
     Returns:
         str: Путь к файлу с результатами анализа или None в случае ошибки
     """
+    if engine not in ANALYSIS_ENGINES:
+        raise ValueError(f"Неизвестный движок '{engine}', допустимые: {', '.join(ANALYSIS_ENGINES)}")
+    if engine == 'external' and run_size < 1:
+        raise ValueError("Размер порции run_size должен быть положительным")
+    group_by = _check_group_by(group_by)
+    
+    spill_dir = tempfile.mkdtemp(prefix='abc_runs_') if engine == 'external' else None
+    arrays = None
     try:
-        # Чтение данных из JSON файла
-        with open(json_file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        print(f"\nЗагружено {len(data)} записей из {Path(json_file_path).name}")
+        if engine == 'external':
+            # Чтение файла потоком с сохранением отсортированных порций на диск
+            run_paths, loaded, count, groups = _external_runs(json_file_path, spill_dir, run_size,
+                                                              period_columns, group_by)
+        else:
+            columns_path = _columnar_path(json_file_path) if engine == 'numpy' else None
+            if columns_path is not None:
+                # Колоночные данные: движок 'numpy' работает прямо с массивами
+                print(f"Используется колоночный формат: {columns_path.name}")
+                table = _load_columnar(columns_path)
+                loaded = table['rows']
+                arrays = _columnar_arrays(table, period_columns, group_by)
+                count = len(arrays['revenue'])
+                groups = arrays['groups']
+            else:
+                # Чтение данных из JSON файла
+                data = _load_records(json_file_path)
+                loaded = len(data)
+                items = _normalize_items(data, period_columns, group_by)
+                count = len(items)
+                groups = _index_groups(items) if group_by else [None]
         
-        # Фильтрация данных - оставляем только элементы с числовым ID
-        items = [i for i in data if isinstance(i.get('№'), (int, float))]
-        print(f"После фильтрации осталось {len(items)} записей")
+        print(f"\nЗагружено {loaded} записей из {Path(json_file_path).name}")
+        print(f"После фильтрации осталось {count} записей")
         
-        if not items:
+        if not count:
             print("⚠ Нет данных для анализа после фильтрации!")
             return None
         
-        # ABC анализ (по выручке)
-        items.sort(key=lambda x: x.get('Выручка (У.Е.)', 0), reverse=True)
-        total_revenue = sum(i.get('Выручка (У.Е.)', 0) for i in items)
+        if group_by:
+            print(f"Группировка по {', '.join(group_by)}: {len(groups)} групп")
         
-        if total_revenue <= 0:
+        if engine == 'external':
+            items = _classify_external(run_paths, bool(group_by))
+        elif arrays is not None:
+            items = _classify_columnar(arrays)
+        elif engine == 'numpy':
+            items = _classify_numpy(items, bool(group_by))
+        else:
+            items = _classify_loop(items, bool(group_by))
+        
+        if items is None:
             print("⚠ Общая выручка равна 0, ABC анализ невозможен!")
             return None
         
-        cumulative = 0
-        
-        for item in items:
-            revenue = item.get('Выручка (У.Е.)', 0)
-            cumulative += revenue
-            percentage = (cumulative / total_revenue) * 100
-            
-            if percentage <= 80:
-                item['ABC'] = 'A'
-            elif percentage <= 95:
-                item['ABC'] = 'B'
-            else:
-                item['ABC'] = 'C'
-        
-        # XYZ анализ (по стабильности продаж по кварталам)
-        for item in items:
-            # Извлекаем квартальные данные
-            quarters = [
-                item.get('Выручка по кварталам (У.Е.)', 0),
-                item.get('Unnamed: 4', 0),
-                item.get('Unnamed: 5', 0),
-                item.get('Unnamed: 6', 0)
-            ]
-            
-            avg = sum(quarters) / len(quarters)
-            
-            if avg > 0:
-                variance = sum((q - avg) ** 2 for q in quarters) / len(quarters)
-                cv = (math.sqrt(variance) / avg) * 100  # Коэффициент вариации
-            else:
-                cv = 100  # Если среднее равно 0, считаем максимальную нестабильность
-            
-            if cv <= 15:
-                item['XYZ'] = 'X'
-            elif cv <= 25:
-                item['XYZ'] = 'Y'
-            else:
-                item['XYZ'] = 'Z'
-            
-            item['ABC_XYZ'] = item['ABC'] + item['XYZ']
-        
-        # Формируем результат в удобном формате
-        result = []
-        for item in items:
-            result_item = {
-                'id': int(item.get('№', 0)),
-                'name': item.get('Наименование товара', ''),
-                'revenue': item.get('Выручка (У.Е.)', 0),
-                'ABC': item.get('ABC', ''),
-                'XYZ': item.get('XYZ', ''),
-                'ABC_XYZ': item.get('ABC_XYZ', '')
-            }
-            result.append(result_item)
+        # Формируем результат в удобном формате (записи создаются по мере записи в файл)
+        stats = stats if stats is not None else _AnalysisStats()
+        result = _result_records(items, stats, group_by, groups)
         
         # Определяем путь для сохранения результатов
-        json_path = Path(json_file_path)
-        results_path = json_path.parent / "analysis_results"
-        results_path.mkdir(exist_ok=True)
+        results_path = _results_path(json_file_path)
+        results_path.mkdir(parents=True, exist_ok=True)
         
         output_path = results_path / output_file_name
         
-        # Сохраняем результат
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(result, f, ensure_ascii=False, indent=2)
+        # Сохраняем результат: временный файл и переименование, поэтому
+        # параллельные и пересекающиеся запуски не оставляют обрезанный файл
+        write_json_atomic(output_path, result, json_profile)
         
         print(f"✓ Анализ завершен. Результат сохранен в: {output_path}")
         
         # Дополнительная статистика
-        abc_stats = {}
-        xyz_stats = {}
-        abc_xyz_stats = {}
-        
-        for item in items:
-            abc_stats[item['ABC']] = abc_stats.get(item['ABC'], 0) + 1
-            xyz_stats[item['XYZ']] = xyz_stats.get(item['XYZ'], 0) + 1
-            abc_xyz_stats[item['ABC_XYZ']] = abc_xyz_stats.get(item['ABC_XYZ'], 0) + 1
+        stats.print_summary()
         
-        print("\nСтатистика анализа:")
-        print(f"ABC распределение: {abc_stats}")
-        print(f"XYZ распределение: {xyz_stats}")
-        print(f"ABC-XYZ матрица: {abc_xyz_stats}")
+        if xlsx_report:
+            export_analysis_xlsx(output_path)
         
         return str(output_path)
         
@@ -129,17 +1075,222 @@ def perform_abc_xyz_analysis(json_file_path, output_file_name="abc_xyz_result.js
     except Exception as e:
         print(f"✗ Ошибка при выполнении анализа: {e}")
         return None
+    finally:
+        if spill_dir:
+            shutil.rmtree(spill_dir, ignore_errors=True)
+
+# Кэш результатов анализа: папка в папке результатов, предельный размер и
+# версия алгоритма анализа. Версия входит в ключ кэша и увеличивается при
+# любом изменении расчета классов, чтобы старые результаты не использовались.
+ANALYSIS_CACHE_DIR = '.cache'
+ANALYSIS_CACHE_INDEX = 'index.json'
+ANALYSIS_CACHE_MAX_BYTES = 256 * 1024 * 1024
+ANALYSIS_VERSION = 2
+
+class _AnalysisCache:
+    """
+    Кэш результатов анализа, адресуемый содержимым
+    
+    Ключ - SHA-256 от хэша входного файла, порогов классов, версии алгоритма
+    (ANALYSIS_VERSION) и параметров, влияющих на результат. Движок в ключ не
+    входит: все движки дают одинаковые классы. Копии результатов хранятся в
+    папке кэша под именем ключа, статистика и время последнего обращения - в
+    индексе. Если размер кэша превышает max_bytes, удаляются записи, к
+    которым дольше всего не обращались.
+    """
+    
+    def __init__(self, cache_dir, max_bytes=ANALYSIS_CACHE_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.index_path = self.cache_dir / ANALYSIS_CACHE_INDEX
+        self.entries = self._load()
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+    
+    def _load(self):
+        # Пустой индекс, если его нет или он поврежден
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            if isinstance(index.get('entries'), dict):
+                return index['entries']
+        except (FileNotFoundError, json.JSONDecodeError, AttributeError):
+            pass
+        return {}
+    
+    def _save(self):
+        # Атомарно: запись во временный файл и переименование
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = temporary_path(self.index_path)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'entries': self.entries}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.index_path)
+    
+    @staticmethod
+    def key(input_file, options):
+        """
+        Ключ кэша для входного файла и параметров анализа
+        """
+        payload = {
+            'input': file_sha256(input_file),
+            'version': ANALYSIS_VERSION,
+            'abc_thresholds': ABC_THRESHOLDS,
+            'xyz_thresholds': XYZ_THRESHOLDS,
+            'options': options
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+    
+    def lookup(self, key, output_path):
+        """
+        Ищет результат в кэше; при попадании существующий файл результата
+        используется как есть, если совпадает с кэшем, иначе восстанавливается
+        
+        Returns:
+            _AnalysisStats: Статистика результата или None при промахе
+        """
+        entry = self.entries.get(key)
+        cached_path = self.cache_dir / entry['file'] if entry else None
+        if entry is None or not cached_path.exists():
+            self.misses += 1
+            return None
+        
+        output_path = Path(output_path)
+        if not output_path.exists() or file_sha256(output_path) != entry['sha256']:
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = temporary_path(output_path)
+            shutil.copyfile(cached_path, tmp_path)
+            os.replace(tmp_path, output_path)
+        
+        entry['used'] = time.time()
+        self._save()
+        self.hits += 1
+        return _AnalysisStats.from_dict(entry['stats'])
+    
+    def store(self, key, output_path, stats):
+        """
+        Сохраняет копию результата и его статистику
+        """
+        output_path = Path(output_path)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        file_name = key + output_path.name[len(output_stem(output_path)):]
+        tmp_path = temporary_path(self.cache_dir / file_name)
+        shutil.copyfile(output_path, tmp_path)
+        os.replace(tmp_path, self.cache_dir / file_name)
+        
+        self.entries[key] = {
+            'file': file_name,
+            'bytes': output_path.stat().st_size,
+            'sha256': file_sha256(output_path),
+            'stats': stats.to_dict(),
+            'used': time.time()
+        }
+        self._evict()
+        self._save()
+    
+    def _evict(self):
+        total = sum(entry['bytes'] for entry in self.entries.values())
+        for key in sorted(self.entries, key=lambda key: self.entries[key]['used']):
+            if total <= self.max_bytes:
+                break
+            entry = self.entries.pop(key)
+            total -= entry['bytes']
+            (self.cache_dir / entry['file']).unlink(missing_ok=True)
+            self.evicted += 1
+    
+    def report(self):
+        """
+        Печатает число попаданий и промахов кэша за запуск
+        """
+        size = sum(entry['bytes'] for entry in self.entries.values())
+        print(f"\nКэш анализа: попаданий {self.hits}, промахов {self.misses}, "
+              f"записей {len(self.entries)} ({size / 1024 / 1024:.1f} МБ)"
+              + (f", вытеснено {self.evicted}" if self.evicted else ""))
+
+def _analyze_worker(json_file, output_file_name, options):
+    """
+    Анализ одного файла (в основном процессе или в процессе пула)
+    
+    Returns:
+        tuple: (путь к результату или None, статистика результата - dict)
+    """
+    stats = _AnalysisStats()
+    result_path = perform_abc_xyz_analysis(json_file, output_file_name, stats=stats, **options)
+    return result_path, stats.to_dict()
+
+def _finish_analysis(json_file, result_path, stats, analysis_cache, key):
+    """
+    Сохраняет результат анализа файла в кэш и возвращает запись списка
+    обработанных файлов (None, если анализ не удался)
+    """
+    if not result_path:
+        return None
+    if analysis_cache:
+        analysis_cache.store(key, result_path, _AnalysisStats.from_dict(stats))
+    return {'input': str(json_file), 'output': result_path, 'cached': False}
 
-def analyze_folder(json_folder, output_folder="analysis_results"):
+def _analysis_output_names(json_files, json_profile, compression):
     """
-    Выполняет ABC-XYZ анализ для всех JSON файлов в папке
+    Имена файлов результатов анализа: <имя>_analysis<расширение профиля>
+    
+    Если у нескольких входных файлов одно имя (data1.json, data1.jsonl,
+    data1.json.gz), в имя результата добавляется расширение входного файла
+    (data1_jsonl_analysis.json, data1_json_gz_analysis.json): иначе
+    результаты перезаписывали бы друг друга.
+    
+    Args:
+        json_files (list): Входные файлы (Path) из одной папки
+        json_profile (str): Профиль вывода результатов
+        compression (str): Сжатие файлов результатов
+    
+    Returns:
+        list: Имена файлов результатов в порядке json_files
+    """
+    suffix = output_suffix(json_profile, compression)
+    stems = [output_stem(json_file) for json_file in json_files]
+    names = []
+    for json_file, stem in zip(json_files, stems):
+        if stems.count(stem) > 1:
+            stem += json_file.name[len(stem):].replace('.', '_')
+        names.append(f"{stem}_analysis{suffix}")
+    
+    duplicates = sorted({stem for stem in stems if stems.count(stem) > 1})
+    if duplicates:
+        print(f"⚠ Несколько входных файлов с именем {', '.join(duplicates)}: "
+              f"в имена результатов добавлено расширение входного файла")
+    return names
+
+def analyze_folder(json_folder, output_folder="analysis_results", json_profile='pretty',
+                   compression=None, xlsx_report=False, engine='loop', run_size=EXTERNAL_RUN_SIZE,
+                   period_columns=None, group_by=None, cache=True,
+                   cache_max_bytes=ANALYSIS_CACHE_MAX_BYTES, workers=None):
+    """
+    Выполняет ABC-XYZ анализ для всех JSON и JSON Lines файлов в папке,
+    включая сжатые (.json.gz, .jsonl.xz, ...)
+    
+    Результаты кэшируются (см. _AnalysisCache): если ни входной файл, ни
+    пороги и параметры анализа не изменились, используется готовый
+    результат. В конце печатается число попаданий и промахов кэша.
+    
+    С workers > 1 файлы, которых нет в кэше, анализируются в пуле
+    процессов; кэш проверяется и обновляется только основным процессом.
     
     Args:
         json_folder (str): Папка с JSON файлами
         output_folder (str): Подпапка для сохранения результатов
+        json_profile (str): Профиль вывода результатов ('pretty', 'compact', 'jsonl')
+        compression (str): Сжатие файлов результатов: None, 'gzip' или 'xz'
+        xlsx_report (bool): Дополнительно сохранить отчеты Excel
+        engine (str): Движок классификации: 'loop', 'numpy' или 'external'
+        run_size (int): Записей в одной порции сортировки движка 'external'
+        period_columns: Столбцы периодов для XYZ (см. perform_abc_xyz_analysis)
+        group_by (str/list): Столбцы группировки (см. perform_abc_xyz_analysis)
+        cache (bool): Использовать кэш результатов
+        cache_max_bytes (int): Предельный размер кэша
+        workers (int): Число процессов для анализа (None или 1 - последовательно)
     
     Returns:
-        list: Список обработанных файлов
+        list: Список обработанных файлов ('cached' - результат из кэша)
     """
     json_path = Path(json_folder)
     
@@ -147,7 +1298,10 @@ def analyze_folder(json_folder, output_folder="analysis_results"):
         print(f"✗ Папка {json_folder} не найдена!")
         return []
     
-    json_files = list(json_path.glob("*.json"))
+    check_compression(compression)
+    json_files = [path for pattern in output_patterns() for path in sorted(json_path.glob(pattern))]
+    # Служебные файлы (например, манифест парсера .manifest.json) не анализируются
+    json_files = [f for f in json_files if not f.name.startswith('.')]
     
     if not json_files:
         print(f"⚠ Папка {json_folder} не содержит JSON файлов!")
@@ -155,16 +1309,135 @@ def analyze_folder(json_folder, output_folder="analysis_results"):
     
     print(f"Найдено {len(json_files)} JSON файлов для анализа:")
     
-    processed_files = []
+    analysis_cache = _AnalysisCache(json_path / RESULTS_FOLDER / ANALYSIS_CACHE_DIR, cache_max_bytes) if cache else None
+    options = {
+        'profile': json_profile,
+        'compression': compression,
+        'period_columns': period_columns if isinstance(period_columns, (str, type(None))) else list(period_columns),
+        'group_by': _check_group_by(group_by)
+    }
+    analysis_options = {
+        'json_profile': json_profile,
+        'xlsx_report': xlsx_report,
+        'engine': engine,
+        'run_size': run_size,
+        'period_columns': period_columns,
+        'group_by': group_by
+    }
+    parallel = bool(workers and workers > 1 and len(json_files) > 1)
+    processed = [None] * len(json_files)
+    # Файлы для пула процессов: (номер, файл, имя результата, ключ кэша)
+    jobs = []
     
-    for json_file in json_files:
+    output_file_names = _analysis_output_names(json_files, json_profile, compression)
+    
+    for index, (json_file, output_file_name) in enumerate(zip(json_files, output_file_names)):
         print(f"\nАнализ файла: {json_file.name}")
-        result_path = perform_abc_xyz_analysis(str(json_file), f"{json_file.stem}_analysis.json")
+        output_path = _results_path(json_file) / output_file_name
+        
+        key = analysis_cache.key(json_file, options) if analysis_cache else None
+        stats = analysis_cache.lookup(key, output_path) if analysis_cache else None
         
-        if result_path:
-            processed_files.append({
-                'input': str(json_file),
-                'output': result_path
-            })
+        if stats is not None:
+            print(f"✓ Результат взят из кэша: {output_path}")
+            stats.print_summary()
+            if xlsx_report and not output_path.with_name(output_stem(output_path) + '.xlsx').exists():
+                export_analysis_xlsx(output_path)
+            processed[index] = {'input': str(json_file), 'output': str(output_path), 'cached': True}
+        elif parallel:
+            jobs.append((index, json_file, output_file_name, key))
+        else:
+            result_path, stats = _analyze_worker(str(json_file), output_file_name, analysis_options)
+            processed[index] = _finish_analysis(json_file, result_path, stats, analysis_cache, key)
     
-    return processed_files
\ No newline at end of file
+    if jobs:
+        # Папка результатов создается заранее, до запуска процессов
+        _results_path(json_files[0]).mkdir(parents=True, exist_ok=True)
+        print(f"\nАнализ {len(jobs)} файлов в {min(workers, len(jobs))} процессах...")
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as executor:
+            futures = [
+                executor.submit(_analyze_worker, str(json_file), output_file_name, analysis_options)
+                for _, json_file, output_file_name, _ in jobs
+            ]
+            for (index, json_file, _, key), future in zip(jobs, futures):
+                try:
+                    result_path, stats = future.result()
+                except Exception as e:
+                    # Например, аварийное завершение процесса-обработчика
+                    print(f"✗ Ошибка при анализе файла {json_file.name}: {e}")
+                    continue
+                processed[index] = _finish_analysis(json_file, result_path, stats, analysis_cache, key)
+    
+    processed_files = [result for result in processed if result]
+    
+    if analysis_cache:
+        analysis_cache.report()
+    
+    return processed_files
+
+def export_analysis_xlsx(analysis_file, xlsx_path=None):
+    """
+    Сохраняет результат ABC-XYZ анализа в книгу Excel
+    
+    Книга пишется в режиме openpyxl write_only, а результат читается по
+    одной записи (iter_json_records), поэтому память не растет с числом
+    товаров. Первый лист "Сводка" - число товаров и выручка по ячейкам
+    матрицы и итоги по ABC и XYZ, затем по листу на каждую ячейку матрицы
+    (AX, AY, ..., CZ) с товарами этой ячейки. У результата с группировкой
+    листы начинаются со столбцов группировки.
+    
+    Args:
+        analysis_file (str): Путь к результату анализа (JSON, JSON Lines,
+            в том числе сжатому)
+        xlsx_path (str): Путь к книге Excel (по умолчанию - рядом с
+            результатом, с расширением .xlsx)
+    
+    Returns:
+        str: Путь к книге Excel или None в случае ошибки
+    """
+    from openpyxl import Workbook
+    
+    analysis_path = Path(analysis_file)
+    if xlsx_path is None:
+        xlsx_path = analysis_path.with_name(output_stem(analysis_path) + '.xlsx')
+    xlsx_path = Path(xlsx_path)
+    tmp_path = temporary_path(xlsx_path)
+    
+    try:
+        workbook = Workbook(write_only=True)
+        # Листы создаются в порядке отображения; сводка заполняется последней
+        summary = workbook.create_sheet('Сводка')
+        sheets = {}
+        for cell in ABC_XYZ_CELLS:
+            sheets[cell] = workbook.create_sheet(cell)
+        
+        records = iter_json_records(analysis_path)
+        first = next(records, None)
+        # Столбцы группировки - ключи записи перед 'id' (см. _result_records)
+        keys = list(first) if first else []
+        group_columns = keys[:keys.index('id')] if 'id' in keys else []
+        columns = [(column, column) for column in group_columns] + list(REPORT_COLUMNS)
+        for cell in ABC_XYZ_CELLS:
+            sheets[cell].append([title for _, title in columns])
+        
+        stats = _AnalysisStats()
+        for record in itertools.chain([first] if first else [], records):
+            stats.add(record)
+            sheets[record['ABC_XYZ']].append([record.get(key) for key, _ in columns])
+        
+        for row in stats.summary_rows():
+            summary.append(row)
+        
+        workbook.save(tmp_path)
+        os.replace(tmp_path, xlsx_path)
+        
+        print(f"✓ Отчет Excel сохранен в: {xlsx_path}")
+        return str(xlsx_path)
+        
+    except FileNotFoundError:
+        print(f"✗ Файл {analysis_file} не найден!")
+        return None
+    except Exception as e:
+        Path(tmp_path).unlink(missing_ok=True)
+        print(f"✗ Ошибка при создании отчета Excel: {e}")
+        return None
@@ -0,0 +1,187 @@
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+def _synthetic_records(rows):
+    """
+    Синтетические записи в исходном формате парсера (как data1.json)
+    """
+    return [
+        {
+            '№': float(index),
+            'Наименование товара': f"Товар {index % 5000}",
+            'Выручка (У.Е.)': float((index * 7919) % 20000),
+            'Выручка по кварталам (У.Е.)': (index * 31) % 5000,
+            'Unnamed: 4': (index * 37) % 5000,
+            'Unnamed: 5': (index * 41) % 5000,
+            'Unnamed: 6': (index * 43) % 5000
+        }
+        for index in range(1, rows + 1)
+    ]
+
+def bench_json_profiles(rows=200000):
+    """
+    Сравнивает профили вывода JSON: объем файла и время записи
+
+    Для каждого профиля замеряется запись из DataFrame (как в парсере) и
+    из списка словарей (как в анализаторе), а для записей - еще и со
+    сжатием gzip/xz.
+
+    Args:
+        rows (int): Число записей
+
+    Returns:
+        list: Результаты замеров (dict)
+    """
+    import pandas as pd
+    from json_io import COMPRESSION_SUFFIXES, JSON_PROFILES, output_suffix, write_json_records
+
+    records = _synthetic_records(rows)
+    df = pd.DataFrame(records)
+    results = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Прежний способ: вся строка JSON собирается в памяти и записывается разом
+        path = Path(tmp) / "baseline.json"
+        start = time.perf_counter()
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(df.to_json(orient='records', force_ascii=False, indent=2))
+        results.append({'source': 'DataFrame', 'profile': 'to_json(indent=2)', 'compression': None,
+                        'bytes': path.stat().st_size, 'seconds': time.perf_counter() - start})
+
+        variants = [('DataFrame', df, None)]
+        variants += [('records', records, compression) for compression in COMPRESSION_SUFFIXES]
+        for source, data, compression in variants:
+            for profile in JSON_PROFILES:
+                path = Path(tmp) / f"{source}_{profile}{output_suffix(profile, compression)}"
+                start = time.perf_counter()
+                write_json_records(path, data, profile)
+                results.append({'source': source, 'profile': profile, 'compression': compression,
+                                'bytes': path.stat().st_size, 'seconds': time.perf_counter() - start})
+
+    print(f"\nПрофили вывода JSON ({rows} записей):")
+    print(f"{'Источник':<10} {'Профиль':<18} {'Сжатие':<7} {'Размер, МБ':>11} {'Время, с':>9}")
+    for result in results:
+        print(f"{result['source']:<10} {result['profile']:<18} {result['compression'] or '-':<7} "
+              f"{result['bytes'] / 1024 / 1024:>11.2f} {result['seconds']:>9.3f}")
+
+    return results
+
+def _write_synthetic_xlsx(path, rows):
+    """
+    Создает XLSX с квартальной таблицей (двухстрочный заголовок, как data1.xlsx)
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Лист1')
+    sheet.append(['№', 'Наименование товара', 'Выручка (У.Е.)', 'Выручка по кварталам (У.Е.)'])
+    sheet.append([None, None, None, 'I', 'II', 'III', 'IV'])
+    for record in _synthetic_records(rows):
+        sheet.append(list(record.values()))
+    workbook.save(path)
+
+# Код замера в отдельном процессе: время включает импорт модулей,
+# пиковая память - максимальный RSS процесса
+_READER_PROBE = """
+import resource, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {parser_dir!r})
+from excel_parser import xls_to_json_single
+xls_to_json_single({xlsx!r}, {output!r}, reader={reader!r}, typed_schema=True)
+seconds = time.perf_counter() - start
+print(seconds, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, 'pandas' in sys.modules)
+"""
+
+def bench_xlsx_readers(rows=50000):
+    """
+    Сравнивает чтение XLSX через pandas и встроенный легковесный читатель
+
+    Каждый вариант запускается в отдельном процессе, чтобы учесть время
+    импорта pandas/openpyxl и пиковый RSS.
+
+    Args:
+        rows (int): Число строк в синтетической книге
+
+    Returns:
+        list: Результаты замеров (dict)
+    """
+    import subprocess
+
+    parser_dir = str(Path(__file__).resolve().parent)
+    results = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        xlsx = str(Path(tmp) / "bench.xlsx")
+        _write_synthetic_xlsx(xlsx, rows)
+
+        for reader in ('pandas', 'lite'):
+            code = _READER_PROBE.format(parser_dir=parser_dir, xlsx=xlsx,
+                                        output=str(Path(tmp) / reader), reader=reader)
+            completed = subprocess.run([sys.executable, '-c', code], capture_output=True,
+                                       text=True, check=True)
+            seconds, max_rss, pandas_loaded = completed.stdout.strip().splitlines()[-1].split()
+            results.append({'reader': reader, 'seconds': float(seconds),
+                            'max_rss_kb': int(max_rss), 'pandas_loaded': pandas_loaded == 'True'})
+
+    print(f"\nЧтение XLSX ({rows} строк, с учетом импорта модулей):")
+    print(f"{'Читатель':<10} {'Время, с':>9} {'Пик RSS, МБ':>12} {'pandas':>7}")
+    for result in results:
+        print(f"{result['reader']:<10} {result['seconds']:>9.3f} "
+              f"{result['max_rss_kb'] / 1024:>12.1f} {'да' if result['pandas_loaded'] else 'нет':>7}")
+
+    return results
+
+def bench_analysis_engines(rows=1000000):
+    """
+    Сравнивает движки ABC-XYZ классификации: циклы Python и NumPy
+
+    Оба движка получают одни и те же нормализованные записи; классы должны
+    совпадать для каждой записи.
+
+    Args:
+        rows (int): Число записей
+
+    Returns:
+        list: Результаты замеров (dict)
+    """
+    from analyzer import _classify_loop, _classify_numpy, _normalize_items
+
+    # Движок 'external' работает с файлом на диске и здесь не сравнивается
+    classify = {'loop': _classify_loop, 'numpy': _classify_numpy}
+    source = _normalize_items(_synthetic_records(rows))
+    results = []
+    classes = {}
+
+    for engine in classify:
+        items = [dict(item, quarters=list(item['quarters'])) for item in source]
+        start = time.perf_counter()
+        items = classify[engine](items)
+        results.append({'engine': engine, 'seconds': time.perf_counter() - start})
+        classes[engine] = [(item['id'], item['ABC_XYZ']) for item in items]
+
+    if classes['loop'] != classes['numpy']:
+        raise AssertionError("Движки дали разные классы")
+
+    print(f"\nДвижки ABC-XYZ анализа ({rows} записей, классы совпадают):")
+    print(f"{'Движок':<8} {'Время, с':>9}")
+    for result in results:
+        print(f"{result['engine']:<8} {result['seconds']:>9.3f}")
+
+    return results
+
+BENCHMARKS = {
+    'json': bench_json_profiles,
+    'xlsx': bench_xlsx_readers,
+    'analysis': bench_analysis_engines
+}
+
+if __name__ == "__main__":
+    # Запуск: python benchmark.py [имя замера] [число записей]
+    names = [sys.argv[1]] if len(sys.argv) > 1 else list(BENCHMARKS)
+    for name in names:
+        if len(sys.argv) > 2:
+            BENCHMARKS[name](int(sys.argv[2]))
+        else:
+            BENCHMARKS[name]()
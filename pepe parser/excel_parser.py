@@ -1,117 +1,2193 @@
-import pandas as pd
+import codecs
+import csv
+import itertools
 import json
+import math
+import multiprocessing
+import numbers
+import os
+import re
+import shutil
+import threading
+import time
+import tracemalloc
+import zipfile
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.connection import wait as wait_connections
 from pathlib import Path
+from json_io import (COLUMNAR_SCHEMA_FILE, COLUMNAR_SUFFIX, JsonRecordWriter, check_compression,
+                     check_profile, file_sha256, open_json_file, output_suffix, temporary_path,
+                     write_json_atomic)
 
-def xls_to_json_batch(input_folder, output_folder, sheet_name=0):
+# Имя файла манифеста инкрементальной конвертации (в выходной папке)
+MANIFEST_FILE_NAME = '.manifest.json'
+
+# Типизированная схема листа (typed_schema=True): поле -> тип.
+# quarters - выручка по периодам (для квартальных отчетов float[4]).
+# Столбцы keep_columns проекции (например, столбцы группировки анализа)
+# добавляются к схеме под своими именами как строки ('str').
+TYPED_SCHEMA = {
+    'id': 'int',
+    'name': 'str',
+    'revenue': 'float',
+    'quarters': 'float[]'
+}
+
+# Читатели XLSX: pandas (pd.read_excel) и встроенный легковесный (_LiteXlsxWorkbook)
+EXCEL_READERS = ('pandas', 'lite')
+
+# Поддерживаемые входные файлы (в этом порядке они обрабатываются в пакете)
+CSV_SUFFIXES = ('.csv', '.tsv')
+INPUT_SUFFIXES = ('.xlsx', '.xls') + CSV_SUFFIXES
+
+# CSV читается порциями по CSV_CHUNK_SIZE строк; кодировка и разделитель
+# определяются по первым CSV_SNIFF_BYTES байтам
+CSV_CHUNK_SIZE = 100000
+CSV_SNIFF_BYTES = 64 * 1024
+
+# Сколько строк читается для определения столбцов листа при проекции
+PROJECTION_SAMPLE_ROWS = 10
+
+# Оценка пиковой памяти конвертации для бюджета памяти (memory_budget):
+# байт памяти на байт распакованного XML листов XLSX, на байт файла XLS и на
+# байт одной порции CSV. Подобраны по замерам прироста RSS с запасом
+# (pandas на XLSX - около 3.4 байта на байт XML).
+MEMORY_ESTIMATE_FACTORS = {'xlsx': 5.0, 'xls': 8.0, 'csv': 10.0}
+
+# Потоковое чтение XLSX почти не зависит от размера листа (около 12 МБ):
+# в памяти порция записей и общие строки книги (sharedStrings.xml)
+STREAM_MEMORY_BASE = 16 * 1024 * 1024
+
+# Интервал опроса RSS процесса при измерении пиковой памяти, секунды
+RSS_SAMPLE_INTERVAL = 0.05
+
+# Символы, недопустимые в именах файлов (для имен листов в именах выходных файлов)
+_UNSAFE_FILE_CHARS = re.compile(r'[\\/:*?"<>|]')
+
+def _error_result(excel_file, message, **extra):
     """
-    Парсер всех XLS/XLSX файлов из папки в JSON файлы в другую папку
+    Метаданные файла, который не удалось сконвертировать
     
     Args:
-        input_folder (str): Путь к папке с XLS/XLSX файлами
-        output_folder (str): Путь к папке для сохранения JSON файлов
-        sheet_name (int/str): Номер или имя листа для чтения (по умолчанию: 0)
+        excel_file (Path): Входной файл
+        message (str): Текст ошибки
+        **extra: Дополнительные ключи (например, timed_out=True)
     
     Returns:
-        list: Список обработанных файлов с метаданными
+        dict: {'input': ..., 'error': ..., 'file_name': ..., **extra}
     """
-    # Создаем объекты Path для удобной работы с путями
-    input_path = Path(input_folder)
-    output_path = Path(output_folder)
+    return {'input': str(excel_file), 'error': message, 'file_name': excel_file.name, **extra}
+
+def _iter_sheet_records(rows):
+    """
+    Превращает поток строк листа в записи, не загружая лист в память целиком
     
-    # Проверяем существование входной папки
-    if not input_path.exists():
-        raise FileNotFoundError(f"Папка {input_folder} не найдена!")
+    Строки берутся из инкрементального читателя (openpyxl в режиме read_only
+    или _LiteXlsxWorkbook), поэтому потребление памяти не зависит от числа
+    строк. Первая строка листа считается заголовком (как в pd.read_excel).
     
-    # Создаем выходную папку, если она не существует
-    output_path.mkdir(parents=True, exist_ok=True)
+    Args:
+        rows (iterator): Строки листа - кортежи значений ячеек
     
-    # Получаем список всех XLS/XLSX файлов
-    excel_files = list(input_path.glob("*.xlsx")) + list(input_path.glob("*.xls"))
+    Yields:
+        list: Сначала список имен столбцов, затем записи (dict) по одной на строку
+    """
+    rows = iter(rows)
+    header = next(rows, None)
+    if header is None:
+        yield []
+        return
     
-    if not excel_files:
-        print("⚠ Входная папка не содержит XLS/XLSX файлов!")
-        return []
+    # Хвостовые пустые ячейки заголовка отбрасываются (как в pandas)
+    header = list(header)
+    while header and header[-1] is None:
+        header.pop()
     
-    print(f"Найдено {len(excel_files)} файлов для обработки:")
+    # Имена столбцов по правилам pandas: пустые -> "Unnamed: N",
+    # повторяющиеся -> "имя.1", "имя.2", ...
+    columns = []
+    seen = {}
+    for index, value in enumerate(header):
+        name = f"Unnamed: {index}" if value is None else str(value)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        columns.append(name)
+    yield columns
     
-    processed_files = []
+    # Пустые строки откладываются: хвостовые пустые строки pandas отбрасывает
+    pending_empty = 0
+    for row in rows:
+        if all(value is None for value in row):
+            pending_empty += 1
+            continue
+        
+        for _ in range(pending_empty):
+            yield dict.fromkeys(columns)
+        pending_empty = 0
+        
+        record = dict.fromkeys(columns)
+        for index, value in enumerate(row):
+            if index >= len(columns):
+                if value is None:
+                    continue
+                while len(columns) <= index:
+                    columns.append(f"Unnamed: {len(columns)}")
+                    record[columns[-1]] = None
+            record[columns[index]] = value
+        yield record
+
+class _LiteReaderUnsupported(Exception):
+    """
+    Книга использует возможности, которые не поддерживает _LiteXlsxWorkbook
+    (даты, strict OOXML и т.п.) - нужно читать через pandas
+    """
+
+class _LiteXlsxWorkbook:
+    """
+    Легковесный читатель XLSX на zipfile и ElementTree.iterparse
+    
+    Не импортирует pandas и openpyxl: читает список листов из workbook.xml,
+    общие строки из sharedStrings.xml и строки листа инкрементально из
+    worksheets/sheetN.xml. Подходит для обычных таблиц из чисел и строк.
+    Для ячеек с форматом даты и нестандартных книг бросает
+    _LiteReaderUnsupported - тогда используется pd.read_excel.
+    
+    Интерфейс повторяет нужную часть openpyxl: sheetnames, iter_rows(sheet), close().
+    """
+    
+    NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+    REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+    PKG_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
     
-    for excel_file in excel_files:
+    # Встроенные форматы чисел Excel, означающие дату или время
+    DATE_FORMAT_IDS = set(range(14, 23)) | set(range(27, 37)) | {45, 46, 47} | set(range(50, 59))
+    
+    def __init__(self, excel_file):
+        self.zip = zipfile.ZipFile(excel_file)
         try:
-            print(f"\nОбработка файла: {excel_file.name}")
+            self._sheets = self._read_sheets()
+            self._shared_strings = None
+            self._date_styles = self._read_date_styles()
+        except KeyError as e:
+            self.zip.close()
+            raise _LiteReaderUnsupported(f"нет части книги {e}")
+        except Exception:
+            self.zip.close()
+            raise
+    
+    @property
+    def sheetnames(self):
+        return list(self._sheets)
+    
+    def close(self):
+        self.zip.close()
+    
+    def _read_sheets(self):
+        """
+        Имена листов и пути к их XML внутри архива (в порядке книги)
+        """
+        rels = {}
+        with self.zip.open('xl/_rels/workbook.xml.rels') as f:
+            for rel in ET.parse(f).getroot().iter(f'{self.PKG_REL_NS}Relationship'):
+                target = rel.get('Target')
+                target = target.lstrip('/') if target.startswith('/') else 'xl/' + target
+                rels[rel.get('Id')] = target
+        
+        sheets = {}
+        with self.zip.open('xl/workbook.xml') as f:
+            root = ET.parse(f).getroot()
+        if not root.tag.startswith(self.NS):
+            raise _LiteReaderUnsupported("нестандартное пространство имен (strict OOXML)")
+        for sheet in root.iter(f'{self.NS}sheet'):
+            sheets[sheet.get('name')] = rels[sheet.get(f'{self.REL_NS}id')]
+        return sheets
+    
+    def _read_date_styles(self):
+        """
+        Индексы стилей ячеек (атрибут s), у которых формат числа - дата/время
+        """
+        if 'xl/styles.xml' not in self.zip.namelist():
+            return set()
+        
+        with self.zip.open('xl/styles.xml') as f:
+            root = ET.parse(f).getroot()
+        
+        date_formats = set(self.DATE_FORMAT_IDS)
+        for num_fmt in root.iter(f'{self.NS}numFmt'):
+            # Убираем текст в кавычках и секции [цвет]/[$-локаль], ищем коды дат
+            code = re.sub(r'"[^"]*"|\[[^\]]*\]|\\.', '', num_fmt.get('formatCode', ''))
+            if re.search(r'[dmyhs]', code, re.IGNORECASE):
+                date_formats.add(int(num_fmt.get('numFmtId')))
+        
+        cell_xfs = root.find(f'{self.NS}cellXfs')
+        if cell_xfs is None:
+            return set()
+        return {
+            index for index, xf in enumerate(cell_xfs.iter(f'{self.NS}xf'))
+            if int(xf.get('numFmtId', 0)) in date_formats
+        }
+    
+    def _read_shared_strings(self):
+        """
+        Таблица общих строк (читается один раз, при первом обращении)
+        """
+        strings = []
+        if 'xl/sharedStrings.xml' not in self.zip.namelist():
+            return strings
+        
+        text_tag = f'{self.NS}t'
+        run_tag = f'{self.NS}r'
+        with self.zip.open('xl/sharedStrings.xml') as f:
+            for _, elem in ET.iterparse(f):
+                if elem.tag != f'{self.NS}si':
+                    continue
+                # Обычная строка - <t>, форматированная - несколько <r><t>;
+                # фонетические подсказки <rPh> пропускаются
+                parts = []
+                for child in elem:
+                    if child.tag == text_tag:
+                        parts.append(child.text or '')
+                    elif child.tag == run_tag:
+                        parts.extend(t.text or '' for t in child.iter(text_tag))
+                strings.append(''.join(parts))
+                elem.clear()
+        return strings
+    
+    @staticmethod
+    def _column_index(reference):
+        """
+        Номер столбца (с 0) по адресу ячейки: 'A1' -> 0, 'AB12' -> 27
+        """
+        index = 0
+        for char in reference:
+            if not char.isalpha():
+                break
+            index = index * 26 + ord(char.upper()) - 64
+        return index - 1
+    
+    def iter_rows(self, sheet_name):
+        """
+        Инкрементально читает строки листа
+        
+        Yields:
+            tuple: Значения ячеек строки (пропущенные строки - пустые кортежи)
+        """
+        if self._shared_strings is None:
+            self._shared_strings = self._read_shared_strings()
+        
+        ns = self.NS
+        row_tag, cell_tag, value_tag = f'{ns}row', f'{ns}c', f'{ns}v'
+        inline_tag, text_tag = f'{ns}is', f'{ns}t'
+        
+        with self.zip.open(self._sheets[sheet_name]) as f:
+            context = ET.iterparse(f, events=('start', 'end'))
+            sheet_data = None
+            expected_row = 1
             
-            # Чтение Excel файла
-            df = pd.read_excel(excel_file, sheet_name=sheet_name)
+            for event, elem in context:
+                if event == 'start':
+                    if elem.tag == f'{ns}sheetData':
+                        sheet_data = elem
+                    continue
+                if elem.tag != row_tag:
+                    continue
+                
+                row_number = int(elem.get('r', expected_row))
+                # Строки без ячеек в XML не записываются
+                for _ in range(row_number - expected_row):
+                    yield ()
+                expected_row = row_number + 1
+                
+                values = []
+                for position, cell in enumerate(elem.iter(cell_tag)):
+                    reference = cell.get('r')
+                    column = self._column_index(reference) if reference else position
+                    while len(values) < column:
+                        values.append(None)
+                    values.append(self._cell_value(cell, value_tag, inline_tag, text_tag))
+                yield tuple(values)
+                
+                # Разобранные строки удаляются из дерева - память не растет
+                elem.clear()
+                if sheet_data is not None:
+                    sheet_data.clear()
+    
+    def _cell_value(self, cell, value_tag, inline_tag, text_tag):
+        """
+        Значение ячейки с учетом ее типа (атрибут t)
+        """
+        cell_type = cell.get('t', 'n')
+        
+        if cell_type == 'inlineStr':
+            inline = cell.find(inline_tag)
+            if inline is None:
+                return None
+            return ''.join(t.text or '' for t in inline.iter(text_tag))
+        
+        value = cell.findtext(value_tag)
+        if value is None:
+            return None
+        if cell_type == 's':
+            return self._shared_strings[int(value)]
+        if cell_type == 'str':
+            return value
+        if cell_type == 'b':
+            return value == '1'
+        if cell_type == 'e':
+            # Ошибки формул (#DIV/0! и т.п.) - пустые ячейки, как в pandas
+            return None
+        if cell_type != 'n':
+            raise _LiteReaderUnsupported(f"тип ячейки '{cell_type}'")
+        
+        if cell.get('s') is not None and int(cell.get('s')) in self._date_styles:
+            raise _LiteReaderUnsupported("ячейки с датами")
+        
+        if '.' in value or 'E' in value or 'e' in value:
+            return float(value)
+        return int(value)
+
+def _is_missing(value):
+    """
+    Пустая ячейка: None, NaN или пропуск pandas (NaT, NA) - без импорта pandas
+    """
+    if value is None:
+        return True
+    if isinstance(value, float):
+        return math.isnan(value)
+    return type(value).__name__ in ('NaTType', 'NAType')
+
+def _merge_header_rows(columns, first_row):
+    """
+    Распознает двухстрочный заголовок и объединяет его строки
+    
+    В квартальных отчетах подписи периодов (I, II, III, IV) стоят в первой
+    строке данных под общим заголовком группы, а соседние столбцы группы
+    pandas называет "Unnamed: N". Такая строка узнается по пустому первому
+    столбцу (№) и тому, что все ее заполненные ячейки - строки.
+    
+    Args:
+        columns (list): Имена столбцов (первая строка листа)
+        first_row (list): Значения первой строки данных
+    
+    Returns:
+        tuple: (объединенные имена столбцов, {группа: [столбцы группы]})
+            или None, если заголовок однострочный
+    """
+    values = [None if _is_missing(value) else value for value in first_row]
+    labels = [value for value in values if value is not None]
+    
+    if not values or values[0] is not None or not labels:
+        return None
+    if not all(isinstance(value, str) for value in labels):
+        return None
+    
+    merged = []
+    groups = {}
+    group = None
+    for column, label in zip(columns, values):
+        column = str(column)
+        if not column.startswith('Unnamed:'):
+            group = column
+        if label is None:
+            merged.append(column)
+            continue
+        name = f"{group} {label.strip()}" if group else label.strip()
+        merged.append(name)
+        groups.setdefault(group, []).append(name)
+    
+    return merged, groups
+
+def _compile_typed_schema(columns, groups=None):
+    """
+    Сопоставляет столбцы листа полям типизированной схемы TYPED_SCHEMA
+    
+    Args:
+        columns (list): Имена столбцов (после объединения заголовка)
+        groups (dict): Группы подзаголовков из _merge_header_rows
+    
+    Returns:
+        dict: {'id': столбец, 'name': столбец, 'revenue': столбец,
+            'quarters': [столбцы периодов]}
+    """
+    normalized = [(column, str(column).strip().lower()) for column in columns]
+    
+    # Периоды: группа подзаголовков (предпочтительно "... по кварталам ...")
+    quarters = []
+    if groups:
+        candidates = [names for group, names in groups.items() if len(names) > 1]
+        quarterly = [names for group, names in groups.items()
+                     if group and 'кварт' in group.lower()]
+        quarters = (quarterly or candidates or [[]])[0]
+    if not quarters:
+        quarters = [column for column, name in normalized if 'кварт' in name]
+    
+    schema = {'id': None, 'name': None, 'revenue': None, 'quarters': list(quarters)}
+    for column, name in normalized:
+        if column in schema['quarters']:
+            continue
+        if schema['id'] is None and (name.startswith('№') or name == 'id'):
+            schema['id'] = column
+        elif schema['name'] is None and (name.startswith('наименование') or name == 'name'):
+            schema['name'] = column
+        elif schema['revenue'] is None and ('выручка' in name or name == 'revenue'):
+            schema['revenue'] = column
+    
+    if schema['id'] is None or schema['revenue'] is None:
+        raise ValueError("Не удалось сопоставить столбцы листа с типизированной схемой "
+                         "(нужны как минимум '№' и 'Выручка')")
+    
+    return schema
+
+def _typed_layout(columns, first_row, keep_columns=()):
+    """
+    Компилирует типизированную схему в позиции столбцов
+    
+    Args:
+        columns (list): Имена столбцов листа
+        first_row (list): Значения первой строки данных (проверка на подзаголовки)
+        keep_columns (list): Дополнительные столбцы, которые сохраняются как есть
+    
+    Returns:
+        tuple: (позиции {'id', 'name', 'revenue', 'quarters', 'extra': {имя
+            дополнительного столбца: позиция}}, True если первая строка -
+            подзаголовки и ее нужно пропустить)
+    """
+    names, groups = [str(column) for column in columns], None
+    # Дополнительные столбцы ищутся по исходным именам (до объединения заголовка)
+    extra = {name: names.index(name) for name in keep_columns if name in names and name not in TYPED_SCHEMA}
+    header = _merge_header_rows(names, first_row) if first_row is not None else None
+    if header is not None:
+        names, groups = header
+    
+    schema = _compile_typed_schema(names, groups)
+    position = {name: index for index, name in enumerate(names)}
+    layout = {
+        'id': position[schema['id']],
+        'name': position.get(schema['name']),
+        'revenue': position[schema['revenue']],
+        'quarters': [position[name] for name in schema['quarters']],
+        'extra': extra
+    }
+    return layout, header is not None
+
+def _typed_table(df, layout=None, keep_columns=()):
+    """
+    Преобразует лист (или порцию строк) в типизированные столбцы по схеме TYPED_SCHEMA
+    
+    Строка подзаголовков объединяется с заголовком, строки без числового
+    идентификатора отбрасываются.
+    
+    Args:
+        df (DataFrame): Данные листа в исходном виде
+        layout (dict): Позиции столбцов, полученные для первой порции того же
+            файла (None - определить по df)
+        keep_columns (list): Дополнительные столбцы (см. _typed_layout)
+    
+    Returns:
+        tuple: (таблица, layout). Таблица - массивы NumPy 'id' (int64),
+            'name' (str), 'revenue' (float64), 'quarters' (float64, N x число
+            периодов) и 'extra' - {имя столбца: массив строк}
+    """
+    import numpy as np
+    import pandas as pd
+    
+    if layout is None:
+        first_row = df.iloc[0].tolist() if len(df) else None
+        layout, skip_first = _typed_layout(list(df.columns), first_row, keep_columns)
+        if skip_first:
+            df = df.iloc[1:]
+    
+    ids = pd.to_numeric(df.iloc[:, layout['id']], errors='coerce')
+    mask = (ids.notna() & np.isfinite(ids)).to_numpy()
+    rows = df[mask]
+    
+    def numeric(index):
+        return pd.to_numeric(rows.iloc[:, index], errors='coerce').fillna(0).to_numpy(dtype='float64')
+    
+    def strings(index):
+        return rows.iloc[:, index].astype(object).fillna('').astype(str).to_numpy()
+    
+    if layout['name'] is None:
+        names = np.full(len(rows), '', dtype=str)
+    else:
+        names = strings(layout['name'])
+    
+    if layout['quarters']:
+        quarters = np.column_stack([numeric(index) for index in layout['quarters']])
+    else:
+        quarters = np.zeros((len(rows), 0))
+    
+    table = {
+        'id': ids[mask].to_numpy().astype('int64'),
+        'name': names,
+        'revenue': numeric(layout['revenue']),
+        'quarters': quarters,
+        'extra': {name: strings(index) for name, index in layout['extra'].items()}
+    }
+    return table, layout
+
+def _iter_typed_records(table):
+    """
+    Записи типизированной таблицы в виде словарей для JSON
+    """
+    extra = list(table['extra'])
+    for item_id, name, revenue, quarters, *values in zip(
+            table['id'].tolist(), table['name'].tolist(), table['revenue'].tolist(),
+            table['quarters'].tolist(), *[table['extra'][column].tolist() for column in extra]):
+        record = {'id': item_id, 'name': name, 'revenue': revenue, 'quarters': quarters}
+        record.update(zip(extra, values))
+        yield record
+
+def _typed_schema_fields(periods, extra=()):
+    """
+    Описание типизированной схемы для метаданных: {поле: тип}
+    """
+    return dict(TYPED_SCHEMA, quarters=f"float[{periods}]", **{column: 'str' for column in extra})
+
+def _typed_schema_description(table):
+    """
+    Описание типизированной схемы таблицы для метаданных
+    """
+    return _typed_schema_fields(table['quarters'].shape[1], table['extra'])
+
+def _iter_typed_stream(columns, records, keep_columns=()):
+    """
+    Потоковое преобразование записей листа в типизированные записи
+    
+    Первая запись проверяется на строку подзаголовков; дальше каждая строка
+    конвертируется сразу, без накопления в памяти.
+    
+    Args:
+        columns (list): Имена столбцов листа
+        records (iterator): Записи (dict) из _iter_sheet_records
+        keep_columns (list): Дополнительные столбцы (см. _typed_layout)
+    
+    Yields:
+        dict: Типизированные записи (id, name, revenue, quarters и
+            дополнительные столбцы)
+    """
+    first = next(records, None)
+    if first is None:
+        return
+    
+    layout, skip_first = _typed_layout(columns, list(first.values())[:len(columns)], keep_columns)
+    id_index = layout['id']
+    name_index = layout['name']
+    revenue_index = layout['revenue']
+    quarter_indexes = layout['quarters']
+    
+    def to_float(value):
+        try:
+            return float(value) if value is not None else 0.0
+        except (TypeError, ValueError):
+            return 0.0
+    
+    rows = (list(record.values()) for record in records)
+    if not skip_first:
+        rows = itertools.chain([list(first.values())], rows)
+    
+    for values in rows:
+        item_id = values[id_index]
+        if isinstance(item_id, bool) or not isinstance(item_id, (int, float)):
+            continue
+        if not math.isfinite(item_id):
+            continue
+        name = values[name_index] if name_index is not None else None
+        record = {
+            'id': int(item_id),
+            'name': '' if name is None else str(name),
+            'revenue': to_float(values[revenue_index]),
+            'quarters': [to_float(values[index]) for index in quarter_indexes]
+        }
+        for column, index in layout['extra'].items():
+            record[column] = '' if values[index] is None else str(values[index])
+        yield record
+
+def _reset_columns_dir(columns_path):
+    """
+    Создает пустую папку колоночного формата; прежняя папка удаляется, а не
+    перезаписывается на месте - ее файлы могут быть жесткими ссылками
+    у книги-дубликата (см. _link_converted)
+    """
+    if columns_path.exists():
+        shutil.rmtree(columns_path)
+    columns_path.mkdir(parents=True)
+
+class _TypedColumnarWriter:
+    """
+    Сохраняет типизированную таблицу в колоночном формате (см. _write_columnar)
+    порциями; периоды хранятся одной матрицей N x число периодов, а
+    дополнительные столбцы - строковыми массивами extra<номер>.npy
+    
+    Каждая порция сначала сохраняется во временные .npy, при закрытии они
+    копируются в итоговые файлы через np.lib.format.open_memmap - память
+    ограничена размером порции, а не файла.
+    """
+    
+    def __init__(self, columns_path):
+        self.columns_path = columns_path
+        self.parts = 0
+        self.rows = 0
+        # Строковое поле -> ширина строк (символов)
+        self.widths = {'name': 1}
+        self.periods = None
+        self.extra = None
+        _reset_columns_dir(columns_path)
+    
+    def _fields(self):
+        # (поле, имя файла без расширения)
+        return ([(field, field) for field in TYPED_SCHEMA]
+                + [(column, f"extra{index}") for index, column in enumerate(self.extra or ())])
+    
+    def _part_path(self, file_stem, part):
+        return self.columns_path / f"{file_stem}.part{part}.npy"
+    
+    def append(self, table):
+        import numpy as np
+        
+        periods = table['quarters'].shape[1]
+        if self.periods is None:
+            self.periods = periods
+        elif periods != self.periods:
+            raise ValueError("Число периодов различается между порциями")
+        if self.extra is None:
+            self.extra = list(table['extra'])
+            self.widths.update({column: 1 for column in self.extra})
+        elif list(table['extra']) != self.extra:
+            raise ValueError("Дополнительные столбцы различаются между порциями")
+        
+        for field, file_stem in self._fields():
+            values = table[field] if field in TYPED_SCHEMA else table['extra'][field]
+            if field in self.widths:
+                values = values.astype(str)
+                if values.size:
+                    self.widths[field] = max(self.widths[field], values.dtype.itemsize // 4)
+            np.save(self._part_path(file_stem, self.parts), values)
+        self.parts += 1
+        self.rows += len(table['id'])
+    
+    def close(self):
+        import numpy as np
+        
+        dtypes = {'id': 'int64', 'revenue': 'float64', 'quarters': 'float64'}
+        dtypes.update({field: f'<U{width}' for field, width in self.widths.items()})
+        schema_columns = []
+        
+        for field, file_stem in self._fields():
+            shape = (self.rows, self.periods or 0) if field == 'quarters' else (self.rows,)
+            file_name = f"{file_stem}.npy"
+            target = np.lib.format.open_memmap(self.columns_path / file_name, mode='w+',
+                                               dtype=dtypes[field], shape=shape)
+            offset = 0
+            for part in range(self.parts):
+                part_path = self._part_path(file_stem, part)
+                values = np.load(part_path, mmap_mode='r')
+                target[offset:offset + len(values)] = values
+                offset += len(values)
+                del values
+                part_path.unlink()
+            target.flush()
+            del target
             
-            # Формируем имя выходного JSON файла
-            json_file_name = excel_file.stem + ".json"
+            schema_columns.append({
+                'name': field,
+                'file': file_name,
+                'kind': 'string' if field in self.widths else 'numeric',
+                'dtype': dtypes[field],
+                'shape': list(shape)
+            })
+        
+        schema = {
+            'format': 'columnar',
+            'version': 1,
+            'layout': 'typed',
+            'rows': self.rows,
+            'columns': schema_columns
+        }
+        with open(self.columns_path / COLUMNAR_SCHEMA_FILE, 'w', encoding='utf-8') as f:
+            json.dump(schema, f, ensure_ascii=False, indent=2)
+
+def _write_typed_columnar(table, columns_path):
+    """
+    Сохраняет типизированную таблицу целиком в колоночном формате
+    """
+    writer = _TypedColumnarWriter(columns_path)
+    writer.append(table)
+    writer.close()
+
+def _sheet_output_stem(excel_file, sheet, multi_sheet):
+    """
+    Имя выходного файла без расширения: <книга> или <книга>__<лист>
+    """
+    if not multi_sheet:
+        return excel_file.stem
+    return f"{excel_file.stem}__{_UNSAFE_FILE_CHARS.sub('_', str(sheet))}"
+
+def _select_sheets(sheet_names, sheet_name):
+    """
+    Определяет листы для чтения
+    
+    Args:
+        sheet_names (list): Имена всех листов книги
+        sheet_name (int/str/list/None): Номер или имя листа, список номеров/имен
+            или None для всех листов
+    
+    Returns:
+        list: Имена выбранных листов
+    """
+    if sheet_name is None:
+        return list(sheet_names)
+    
+    requested = sheet_name if isinstance(sheet_name, (list, tuple)) else [sheet_name]
+    selected = []
+    for sheet in requested:
+        if isinstance(sheet, int):
+            selected.append(sheet_names[sheet])
+        elif sheet in sheet_names:
+            selected.append(sheet)
+        else:
+            raise ValueError(f"Лист '{sheet}' не найден")
+    return selected
+
+def _is_multi_sheet(sheet_name):
+    """
+    True, если запрошено несколько листов (список или все листы)
+    """
+    return sheet_name is None or isinstance(sheet_name, (list, tuple))
+
+def _parse_projected(workbook, sheet, projection, filter_rows=True):
+    """
+    Читает лист pd.ExcelFile с учетом проекции
+    
+    Сначала читаются заголовок и несколько строк (столбцы без подписи в
+    заголовке pandas видит только по данным), по ним выбираются позиции
+    столбцов для usecols. Имена столбцов берутся из этого образца, чтобы
+    "Unnamed: N" и "имя.1" совпадали с чтением всего листа.
+    
+    Args:
+        workbook (ExcelFile): Открытая книга
+        sheet (int/str): Лист
+        projection (dict): Проекция из _check_projection или None
+        filter_rows (bool): Отбросить строки без чисел в numeric_columns
+    
+    Returns:
+        DataFrame: Данные листа
+    """
+    if projection is None:
+        return workbook.parse(sheet)
+    
+    header = list(workbook.parse(sheet, nrows=PROJECTION_SAMPLE_ROWS).columns)
+    positions = _projected_positions(header, projection)
+    if positions is None:
+        return workbook.parse(sheet)
+    
+    df = workbook.parse(sheet, usecols=positions)
+    df = df.set_axis([header[index] for index in positions], axis=1)
+    message = f"  Проекция: {len(positions)} из {len(header)} столбцов"
+    if filter_rows:
+        rows = len(df)
+        df = _filter_numeric_rows(df, projection)
+        message += f", {len(df)} из {rows} строк"
+    print(message)
+    return df
+
+def _convert_file_streaming(excel_file, output_path, options):
+    """
+    Потоковая конвертация XLSX: строки листов записываются в файл по мере чтения
+    
+    Returns:
+        list: Метаданные по каждому сконвертированному листу
+    """
+    multi_sheet = _is_multi_sheet(options['sheet_name'])
+    profile = options['json_profile']
+    results = []
+    
+    # Книга открывается и распаковывается один раз для всех листов
+    if options.get('reader') == 'lite':
+        workbook = _LiteXlsxWorkbook(excel_file)
+        sheet_rows = workbook.iter_rows
+    else:
+        from openpyxl import load_workbook
+        
+        workbook = load_workbook(excel_file, read_only=True, data_only=True)
+        sheet_rows = lambda sheet: workbook[sheet].iter_rows(values_only=True)
+    
+    try:
+        for sheet in _select_sheets(workbook.sheetnames, options['sheet_name']):
+            json_file_name = (_sheet_output_stem(excel_file, sheet, multi_sheet)
+                              + output_suffix(profile, options.get('compression')))
             json_file_path = output_path / json_file_name
             
-            # Конвертация в JSON и сохранение
-            json_data = df.to_json(orient='records', force_ascii=False, indent=2)
-            
-            with open(json_file_path, 'w', encoding='utf-8') as f:
-                f.write(json_data)
+            records = _iter_sheet_records(sheet_rows(sheet))
+            columns = next(records)
+            if options.get('projection') is not None:
+                columns, records = _project_stream(columns, records, options['projection'],
+                                                   filter_rows=not options.get('typed_schema'))
+            quarters = []
+            if options.get('typed_schema'):
+                records = _iter_typed_stream(columns, records, _keep_columns(options))
+                # Запоминаем число периодов по первой записи для метаданных
+                first = next(records, None)
+                if first is not None:
+                    quarters = first['quarters']
+                    records = itertools.chain([first], records)
             
-            print(f"✓ JSON сохранен в: {json_file_path}")
+            # Запись во временный файл: если легковесный читатель встретит
+            # неподдерживаемую ячейку, готовый файл не будет испорчен
+            written = write_json_atomic(json_file_path, records, profile)
             
-            processed_files.append({
+            result = {
                 'input': str(excel_file),
                 'output': str(json_file_path),
-                'rows': len(df),
-                'columns': len(df.columns),
+                'sheet': sheet,
+                'rows': written['records'],
+                'columns': len(columns),
                 'file_name': json_file_name
-            })
+            }
+            if options.get('typed_schema'):
+                extra = [column for column in first or () if column not in TYPED_SCHEMA]
+                schema = _typed_schema_fields(len(quarters), extra)
+                result.update(columns=len(schema), schema=schema)
+            results.append(result)
+    finally:
+        workbook.close()
+    
+    return results
+
+def _write_columnar(df, columns_path):
+    """
+    Сохраняет DataFrame в колоночном формате: по одному .npy файлу на столбец
+    и описание схемы schema.json. Файлы читаются через np.load(mmap_mode='r').
+    
+    Типы столбцов в схеме:
+        numeric - числовой массив (NaN вместо пустых ячеек)
+        string - строковый массив фиксированной ширины ('' вместо пустых ячеек)
+        mixed - числа и строки вперемешку (например, строка подзаголовков над
+            числами): числовой массив плюс строковый массив для нечисловых ячеек
+    
+    Args:
+        df (DataFrame): Данные листа
+        columns_path (Path): Папка для файлов столбцов
+    """
+    import numpy as np
+    import pandas as pd
+    
+    _reset_columns_dir(columns_path)
+    schema_columns = []
+    
+    for index, name in enumerate(df.columns):
+        column = df[name]
+        file_name = f"{index}.npy"
+        entry = {'name': str(name), 'file': file_name}
+        
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            column = column.astype(object)
+        
+        if pd.api.types.is_bool_dtype(column) or pd.api.types.is_numeric_dtype(column):
+            if isinstance(column.dtype, pd.api.extensions.ExtensionDtype):
+                # Nullable Int* (lean_dtypes): пустые ячейки -> NaN
+                values = column.to_numpy(dtype='float64', na_value=np.nan)
+            else:
+                values = column.to_numpy()
+            entry['kind'] = 'numeric'
+        else:
+            numbers = pd.to_numeric(column, errors='coerce')
+            non_numeric = column.notna() & numbers.isna()
             
+            if not non_numeric.any():
+                values = numbers.to_numpy(dtype='float64')
+                entry['kind'] = 'numeric'
+            elif non_numeric.sum() == column.notna().sum():
+                values = _to_string_array(column)
+                entry['kind'] = 'string'
+            else:
+                values = numbers.to_numpy(dtype='float64')
+                strings_file = f"{index}.str.npy"
+                np.save(columns_path / strings_file, _to_string_array(column.where(non_numeric)))
+                entry['kind'] = 'mixed'
+                entry['strings_file'] = strings_file
+        
+        np.save(columns_path / file_name, values)
+        entry['dtype'] = str(values.dtype)
+        schema_columns.append(entry)
+    
+    schema = {
+        'format': 'columnar',
+        'version': 1,
+        'rows': len(df),
+        'columns': schema_columns
+    }
+    with open(columns_path / COLUMNAR_SCHEMA_FILE, 'w', encoding='utf-8') as f:
+        json.dump(schema, f, ensure_ascii=False, indent=2)
+
+def _to_string_array(column):
+    """
+    Преобразует столбец в строковый массив NumPy; пустые ячейки -> ''
+    """
+    import numpy as np
+    import pandas as pd
+    
+    return np.array(
+        ['' if pd.isna(value) else (value.isoformat() if hasattr(value, 'isoformat') else str(value))
+         for value in column],
+        dtype=str
+    )
+
+def _lean_dtypes(df):
+    """
+    Уменьшает память DataFrame (режим lean_dtypes)
+    
+    Числовые столбцы с целыми значениями (например, №) приводятся к
+    наименьшему целому типу (nullable Int*, если есть пустые ячейки),
+    дробные - к float32, только если все значения представимы в float32
+    точно (0.5, 1500.25): иначе JSON получил бы шум округления (1234.56 ->
+    1234.5600585938), а итоги выручки изменились бы. Текстовые столбцы с
+    повторяющимися значениями (наименования) становятся категориальными.
+    Столбцы со смешанными значениями (числа под строкой подзаголовков) не
+    меняются. Типы меняются только в памяти: JSON записывается с исходными
+    типами столбцов (JsonRecordWriter.write_dataframe, аргумент dtypes).
+    
+    Args:
+        df (DataFrame): Данные листа
+    
+    Returns:
+        tuple: (DataFrame, {'before_bytes': ..., 'after_bytes': ...})
+    """
+    import numpy as np
+    import pandas as pd
+    
+    usage = df.memory_usage(deep=True, index=False).tolist()
+    before = int(df.memory_usage(deep=True).sum())
+    lean = {}
+    
+    for index, name in enumerate(df.columns):
+        column = df.iloc[:, index]
+        if pd.api.types.is_bool_dtype(column):
+            continue
+        
+        if pd.api.types.is_numeric_dtype(column):
+            present = column.dropna()
+            if present.empty:
+                continue
+            if pd.api.types.is_integer_dtype(column) or (present % 1 == 0).all():
+                dtype = pd.to_numeric(present.astype('int64'), downcast='integer').dtype
+                if len(present) < len(column):
+                    # Int8/Int16/... хранят пустые ячейки маской
+                    dtype = str(dtype).capitalize()
+                lean[index] = column.astype(dtype)
+            elif column.dtype != 'float32':
+                narrow = column.astype('float32')
+                # Без потерь: значения float32 совпадают с исходными (NaN - с NaN)
+                if np.array_equal(narrow.to_numpy(dtype='float64'), column.to_numpy(dtype='float64'),
+                                  equal_nan=True):
+                    lean[index] = narrow
+        elif pd.api.types.is_object_dtype(column) or pd.api.types.is_string_dtype(column):
+            present = column.dropna()
+            if present.empty or not all(isinstance(value, str) for value in present):
+                continue
+            if present.nunique() <= len(present) // 2:
+                category = column.astype('category')
+                # На маленьких листах словарь категорий может быть больше исходного столбца
+                if category.memory_usage(deep=True) < column.memory_usage(deep=True):
+                    lean[index] = category
+    
+    # Разница считается только по замененным столбцам (повторный подсчет
+    # всего DataFrame зависит от внутренних кэшей pandas для строк)
+    after = before
+    if lean:
+        # Поверхностная копия: неизмененные столбцы не дублируются
+        df = df.copy(deep=False)
+        for index, column in lean.items():
+            df.isetitem(index, column)
+            after += int(column.memory_usage(deep=True, index=False)) - int(usage[index])
+    
+    return df, {'before_bytes': before, 'after_bytes': after}
+
+def _format_memory_saved(memory):
+    """
+    Строка отчета об экономии памяти: "1.20 МБ → 0.35 МБ (-71%)"
+    """
+    before, after = memory['before_bytes'], memory['after_bytes']
+    change = (after / before - 1) * 100 if before else 0.0
+    return f"{before / 1024 / 1024:.2f} МБ → {after / 1024 / 1024:.2f} МБ ({change:+.0f}%)"
+
+def _is_number(value):
+    """
+    Числовое значение ячейки (как проверка числового № в анализаторе):
+    int/float и числа NumPy, кроме bool и NaN
+    """
+    if isinstance(value, bool) or not isinstance(value, numbers.Real):
+        return False
+    return not _is_missing(value) and math.isfinite(value)
+
+def _check_projection(projection):
+    """
+    Проверяет проекцию и приводит ее к виду, который сохраняется в манифесте
+    без изменений (списки вместо кортежей)
+    """
+    if projection is None:
+        return None
+    columns = [str(column) for column in projection.get('columns', ())]
+    numeric_columns = [str(column) for column in projection.get('numeric_columns', ())]
+    keep_columns = [str(column) for column in projection.get('keep_columns', ())]
+    if not columns:
+        raise ValueError("Проекция должна содержать список столбцов 'columns'")
+    checked = {'columns': columns, 'numeric_columns': numeric_columns}
+    if keep_columns:
+        checked['keep_columns'] = keep_columns
+    return checked
+
+def _keep_columns(options):
+    """
+    Дополнительные столбцы проекции, которые сохраняются и в типизированной схеме
+    """
+    projection = options.get('projection')
+    return projection.get('keep_columns', []) if projection else []
+
+def _projected_positions(columns, projection):
+    """
+    Позиции столбцов проекции на листе (в порядке листа)
+    
+    Returns:
+        list: Позиции столбцов или None, если каких-то столбцов проекции на
+            листе нет - тогда лист читается целиком
+    """
+    names = [str(column) for column in columns]
+    missing = [column for column in projection['columns'] if column not in names]
+    if missing:
+        print(f"⚠ На листе нет столбцов {', '.join(missing)} - проекция не применяется")
+        return None
+    # Столбцы keep_columns необязательны: читаются, только если они есть на листе
+    wanted = set(projection['columns']) | set(projection.get('keep_columns', ()))
+    return [index for index, name in enumerate(names) if name in wanted]
+
+def _filter_numeric_rows(df, projection):
+    """
+    Оставляет строки DataFrame, в которых все столбцы numeric_columns проекции
+    содержат числа
+    """
+    import pandas as pd
+    
+    mask = pd.Series(True, index=df.index)
+    for column in projection['numeric_columns']:
+        if column not in df.columns:
+            continue
+        values = df[column]
+        if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            mask &= values.notna()
+        else:
+            mask &= values.map(_is_number).astype(bool)
+    return df[mask]
+
+def _project_stream(columns, records, projection, filter_rows):
+    """
+    Проекция для потокового чтения: только столбцы проекции и (если
+    filter_rows) только строки с числами в numeric_columns
+    
+    Столбцы сверяются после первой записи: _iter_sheet_records дополняет
+    список columns по строкам данных, если заголовок короче (хвостовые
+    пустые ячейки заголовка, как у подзаголовков периодов - "Unnamed: 4").
+    
+    Returns:
+        tuple: (столбцы, итератор записей)
+    """
+    first = next(records, None)
+    if first is not None:
+        records = itertools.chain([first], records)
+    if _projected_positions(columns, projection) is None:
+        return columns, records
+    
+    wanted = set(projection['columns']) | set(projection.get('keep_columns', ()))
+    projected = [column for column in columns if column in wanted]
+    print(f"  Проекция: {len(projected)} из {len(columns)} столбцов")
+    numeric_columns = [column for column in projection['numeric_columns'] if column in projection['columns']]
+    
+    def iter_projected():
+        for record in records:
+            if filter_rows and not all(_is_number(record.get(column)) for column in numeric_columns):
+                continue
+            yield {column: record.get(column) for column in projected}
+    
+    return projected, iter_projected()
+
+def _conversion_options(sheet_name, stream, columnar, typed_schema, json_profile, reader,
+                        chunk_size=CSV_CHUNK_SIZE, lean_dtypes=False, projection=None,
+                        compression=None):
+    """
+    Проверяет и собирает параметры конвертации в один словарь (передается
+    в процессы-обработчики и сохраняется в манифесте)
+    """
+    if columnar and stream:
+        raise ValueError("Колоночный формат строится из DataFrame и несовместим с stream=True")
+    
+    if reader not in EXCEL_READERS:
+        raise ValueError(f"Неизвестный читатель '{reader}', допустимые: {', '.join(EXCEL_READERS)}")
+    if reader == 'lite' and columnar:
+        # Колоночный формат требует DataFrame - легковесный читатель не нужен
+        reader = 'pandas'
+    
+    if isinstance(sheet_name, tuple):
+        sheet_name = list(sheet_name)
+    
+    if json_profile is None:
+        json_profile = 'jsonl' if stream else 'pretty'
+    
+    return {
+        'sheet_name': sheet_name,
+        'stream': stream,
+        'columnar': columnar,
+        'typed_schema': typed_schema,
+        'json_profile': check_profile(json_profile),
+        'reader': reader,
+        'chunk_size': chunk_size,
+        'lean_dtypes': lean_dtypes,
+        'projection': _check_projection(projection),
+        'compression': check_compression(compression)
+    }
+
+def _sniff_csv(csv_file):
+    """
+    Определяет кодировку, разделитель и десятичный знак CSV/TSV файла
+    по первым CSV_SNIFF_BYTES байтам
+    
+    Кодировка: UTF-8 (с BOM или без), иначе cp1251 - типичная для выгрузок ERP.
+    Разделитель: табуляция для .tsv, иначе csv.Sniffer среди ',', ';', '\\t', '|'.
+    Десятичная запятая предполагается, если разделитель не запятая и в
+    образце встречаются числа вида 12,5.
+    
+    Returns:
+        tuple: (кодировка, разделитель, десятичный знак)
+    """
+    with open(csv_file, 'rb') as f:
+        sample = f.read(CSV_SNIFF_BYTES)
+    
+    if sample.startswith(codecs.BOM_UTF8):
+        encoding = 'utf-8-sig'
+    else:
+        try:
+            # final=False: последний символ образца может быть обрезан
+            codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+            encoding = 'utf-8'
+        except UnicodeDecodeError:
+            encoding = 'cp1251'
+    
+    text = sample.decode(encoding, errors='ignore')
+    
+    if csv_file.suffix.lower() == '.tsv':
+        sep = '\t'
+    else:
+        try:
+            sep = csv.Sniffer().sniff(text, delimiters=',;\t|').delimiter
+        except csv.Error:
+            sep = ','
+    
+    decimal = ',' if sep != ',' and re.search(r'\d,\d', text) else '.'
+    return encoding, sep, decimal
+
+def _coerce_numeric_cells(chunk, decimal):
+    """
+    Преобразует числовые строки в текстовых колонках порции CSV в числа
+    
+    В Excel каждая ячейка хранит свой тип, а read_csv выводит тип для всей
+    колонки порции: если в порцию попала вторая строка заголовка
+    ("I", "II", ...), числа этой колонки остаются строками. Такие ячейки
+    преобразуются по отдельности, нечисловые значения не меняются.
+    """
+    import pandas as pd
+    
+    for column in chunk.columns:
+        values = chunk[column]
+        if pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values):
+            continue
+        text = values.astype(str).str.strip()
+        if decimal != '.':
+            text = text.str.replace(decimal, '.', regex=False)
+        numbers = pd.to_numeric(text, errors='coerce')
+        converted = numbers.notna() & values.notna()
+        if converted.any():
+            values = values.astype(object)
+            values[converted] = [
+                int(number) if float(number).is_integer() else float(number)
+                for number in numbers[converted]
+            ]
+            chunk[column] = values
+    return chunk
+
+def _align_chunk_dtypes(chunk, dtypes):
+    """
+    Приводит числовые колонки порции CSV к типам первой порции
+    
+    read_csv выводит типы для каждой порции отдельно: колонка с пустой
+    ячейкой в первой порции становится float64 (1.0), а в следующей порции
+    без пропусков - int64 (25). Без выравнивания одна колонка файла
+    записывалась бы в JSON по-разному. Целые значения при типе int первой
+    порции и пропусках в текущей сохраняются как Int64 (null вместо NaN).
+    
+    Args:
+        chunk (DataFrame): Порция после _coerce_numeric_cells
+        dtypes (dict): Типы колонок первой порции
+    """
+    import pandas as pd
+    
+    for column, dtype in dtypes.items():
+        if column not in chunk.columns:
+            continue
+        values = chunk[column]
+        if values.dtype == dtype or not pd.api.types.is_numeric_dtype(values) \
+                or pd.api.types.is_bool_dtype(values):
+            continue
+        if dtype.kind == 'f':
+            chunk[column] = values.astype(dtype)
+        elif dtype.kind in 'iu' and values.dtype.kind == 'f':
+            present = values.dropna()
+            if (present == present.round()).all():
+                chunk[column] = values.astype('Int64')
+    return chunk
+
+def _convert_csv_file(csv_file, output_path, options):
+    """
+    Конвертирует CSV/TSV файл порциями по options['chunk_size'] строк
+    
+    Файл читается через pd.read_csv(chunksize=...), каждая порция сразу
+    записывается в выходной файл, поэтому память ограничена размером порции,
+    а не размером файла. Выходные файлы те же, что и для Excel: JSON в
+    выбранном профиле, типизированная схема и колоночный формат (для CSV -
+    только вместе с typed_schema; без нее в метаданных 'columnar_skipped').
+    Типы колонок всех порций приводятся к типам первой порции.
+    
+    Returns:
+        dict: Метаданные сконвертированного файла
+    """
+    import pandas as pd
+    
+    encoding, sep, decimal = _sniff_csv(csv_file)
+    print(f"  CSV: кодировка {encoding}, разделитель {sep!r}, десятичный знак {decimal!r}")
+    
+    profile = options['json_profile']
+    typed = options.get('typed_schema')
+    json_file_name = csv_file.stem + output_suffix(profile, options.get('compression'))
+    json_file_path = output_path / json_file_name
+    tmp_path = temporary_path(json_file_path)
+    
+    columnar_writer = None
+    if options.get('columnar'):
+        if typed:
+            columnar_writer = _TypedColumnarWriter(output_path / (csv_file.stem + COLUMNAR_SUFFIX))
+        else:
+            print("⚠ Колоночный формат для CSV создается только с typed_schema=True - "
+                  "файл сохраняется без колоночной версии")
+    
+    read_options = {'sep': sep, 'encoding': encoding, 'decimal': decimal}
+    projection = options.get('projection')
+    names = None
+    if projection is not None:
+        header = list(pd.read_csv(csv_file, nrows=PROJECTION_SAMPLE_ROWS, **read_options).columns)
+        positions = _projected_positions(header, projection)
+        if positions is not None:
+            read_options['usecols'] = positions
+            names = [header[index] for index in positions]
+            print(f"  Проекция: {len(positions)} из {len(header)} столбцов")
+    
+    chunks = pd.read_csv(csv_file, chunksize=options['chunk_size'], **read_options)
+    layout = None
+    periods = 0
+    columns = 0
+    # Типы колонок первой порции (см. _align_chunk_dtypes)
+    dtypes = None
+    memory = {'before_bytes': 0, 'after_bytes': 0} if options.get('lean_dtypes') else None
+    
+    try:
+        with open_json_file(tmp_path, 'w') as f:
+            with JsonRecordWriter(f, profile) as writer:
+                for chunk in chunks:
+                    columns = len(chunk.columns)
+                    if names is not None:
+                        chunk = chunk.set_axis(names, axis=1)
+                    chunk = _coerce_numeric_cells(chunk, decimal)
+                    if dtypes is None:
+                        dtypes = chunk.dtypes.to_dict()
+                    else:
+                        chunk = _align_chunk_dtypes(chunk, dtypes)
+                    if names is not None and not typed:
+                        chunk = _filter_numeric_rows(chunk, projection)
+                    written_dtypes = None
+                    if memory is not None:
+                        written_dtypes = chunk.dtypes.tolist()
+                        chunk, chunk_memory = _lean_dtypes(chunk)
+                        for key in memory:
+                            memory[key] += chunk_memory[key]
+                    if typed:
+                        table, layout = _typed_table(chunk, layout, _keep_columns(options))
+                        periods = table['quarters'].shape[1]
+                        writer.write_records(_iter_typed_records(table))
+                        if columnar_writer is not None:
+                            columnar_writer.append(table)
+                    else:
+                        writer.write_dataframe(chunk, written_dtypes)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    os.replace(tmp_path, json_file_path)
+    
+    result = {
+        'input': str(csv_file),
+        'output': str(json_file_path),
+        'sheet': None,
+        'rows': writer.records,
+        'columns': columns,
+        'file_name': json_file_name
+    }
+    if memory is not None:
+        # Сумма по порциям: в памяти одновременно находится только одна порция
+        result['memory'] = memory
+        print(f"  Память порций DataFrame: {_format_memory_saved(memory)}")
+    if typed:
+        schema = _typed_schema_fields(periods, layout['extra'] if layout else ())
+        result.update(columns=len(schema), schema=schema)
+    if columnar_writer is not None:
+        columnar_writer.close()
+        result['columnar'] = str(columnar_writer.columns_path)
+    elif options.get('columnar'):
+        result['columnar_skipped'] = True
+    
+    return result
+
+def _current_rss():
+    """
+    Текущий RSS процесса в байтах (Linux: /proc/self/statm) или None,
+    если его нельзя узнать без сторонних модулей
+    """
+    try:
+        with open('/proc/self/statm', 'rb') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+class _MemoryMonitor:
+    """
+    Измеряет пиковую память обработки одного файла
+    
+    RSS процесса опрашивается в фоновом потоке каждые RSS_SAMPLE_INTERVAL
+    секунд (ru_maxrss не подходит: это максимум за всю жизнь процесса).
+    С trace_allocations=True дополнительно включается tracemalloc - точный
+    пик выделений Python и NumPy, но конвертация заметно замедляется.
+    
+    Пример:
+        with _MemoryMonitor() as monitor:
+            ...
+        monitor.report()  # {'rss_before_bytes': ..., 'peak_rss_bytes': ...}
+    """
+    
+    def __init__(self, trace_allocations=False, interval=RSS_SAMPLE_INTERVAL):
+        self.trace_allocations = trace_allocations
+        self.interval = interval
+        self.rss_before = None
+        self.peak_rss = None
+        self.peak_traced = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._started_tracing = False
+    
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            rss = _current_rss()
+            if rss is not None and rss > self.peak_rss:
+                self.peak_rss = rss
+    
+    def __enter__(self):
+        if self.trace_allocations:
+            if tracemalloc.is_tracing():
+                tracemalloc.reset_peak()
+            else:
+                tracemalloc.start()
+                self._started_tracing = True
+        
+        self.rss_before = self.peak_rss = _current_rss()
+        if self.rss_before is not None:
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        return self
+    
+    def __exit__(self, exc_type, exc, traceback):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self.peak_rss = max(self.peak_rss, _current_rss() or 0)
+        
+        if self.trace_allocations:
+            self.peak_traced = tracemalloc.get_traced_memory()[1]
+            if self._started_tracing:
+                tracemalloc.stop()
+    
+    def report(self):
+        """
+        Returns:
+            dict: Пиковый RSS, RSS до начала обработки и (если включен
+                tracemalloc) пик выделенной памяти, в байтах
+        """
+        report = {'rss_before_bytes': self.rss_before, 'peak_rss_bytes': self.peak_rss}
+        if self.peak_traced is not None:
+            report['peak_traced_bytes'] = self.peak_traced
+        return report
+
+def _xlsx_xml_sizes(excel_file):
+    """
+    Размеры распакованных XML листов и общих строк XLSX (без распаковки)
+    
+    Returns:
+        tuple: ([размеры листов], размер sharedStrings.xml)
+    """
+    with zipfile.ZipFile(excel_file) as archive:
+        infos = archive.infolist()
+    sheets = [info.file_size for info in infos
+              if info.filename.startswith('xl/worksheets/') and info.filename.endswith('.xml')]
+    shared = sum(info.file_size for info in infos if info.filename == 'xl/sharedStrings.xml')
+    return sheets, shared
+
+def _estimate_memory(input_file, options):
+    """
+    Оценивает пиковую память конвертации файла с данными параметрами
+    (по размерам файла, без чтения данных)
+    
+    Returns:
+        int: Оценка в байтах
+    """
+    suffix = input_file.suffix.lower()
+    
+    if suffix in CSV_SUFFIXES:
+        # В памяти одна порция строк: средний размер строки по образцу
+        with open(input_file, 'rb') as f:
+            sample = f.read(CSV_SNIFF_BYTES)
+        row_bytes = len(sample) / max(sample.count(b'\n'), 1)
+        chunk_bytes = min(input_file.stat().st_size, row_bytes * options['chunk_size'])
+        return int(chunk_bytes * MEMORY_ESTIMATE_FACTORS['csv'])
+    
+    if suffix == '.xlsx':
+        try:
+            sheets, shared = _xlsx_xml_sizes(input_file)
+        except zipfile.BadZipFile:
+            return int(input_file.stat().st_size * MEMORY_ESTIMATE_FACTORS['xls'])
+        if options.get('stream') or options.get('reader') == 'lite':
+            return STREAM_MEMORY_BASE + int(shared * MEMORY_ESTIMATE_FACTORS['xlsx'])
+        # Листы читаются по одному, но для одного листа неизвестно, какой
+        # файл ему соответствует - берется самый большой
+        largest = max(sheets, default=0)
+        return int((largest + shared) * MEMORY_ESTIMATE_FACTORS['xlsx'])
+    
+    return int(input_file.stat().st_size * MEMORY_ESTIMATE_FACTORS['xls'])
+
+def _fit_memory_budget(input_file, options, memory_budget):
+    """
+    Подбирает способ конвертации файла под бюджет памяти
+    
+    Если оценка памяти превышает бюджет: XLSX переводится на потоковое
+    чтение, у CSV уменьшается порция, а остальные файлы (XLS, колоночный
+    формат, которому нужен DataFrame) откладываются.
+    
+    Returns:
+        tuple: (параметры конвертации или None, если файл отложен,
+            {'estimated_bytes': ..., 'budget_bytes': ..., 'route': ...})
+    """
+    estimate = _estimate_memory(input_file, options)
+    plan = {'estimated_bytes': estimate, 'budget_bytes': memory_budget, 'route': 'default'}
+    if estimate <= memory_budget:
+        return options, plan
+    
+    suffix = input_file.suffix.lower()
+    megabytes = f"{estimate / 1024 / 1024:.0f} МБ > {memory_budget / 1024 / 1024:.0f} МБ"
+    
+    if suffix in CSV_SUFFIXES:
+        chunk_size = max(1000, int(options['chunk_size'] * memory_budget / estimate))
+        print(f"⚠ {input_file.name}: оценка памяти {megabytes}, порция CSV уменьшена до {chunk_size} строк")
+        return dict(options, chunk_size=chunk_size), dict(plan, route='small_chunks')
+    
+    if suffix == '.xlsx' and not options.get('columnar'):
+        streamed = dict(options, stream=True)
+        estimate = _estimate_memory(input_file, streamed)
+        if estimate <= memory_budget:
+            print(f"⚠ {input_file.name}: оценка памяти {megabytes}, используется потоковое чтение")
+            return streamed, dict(plan, route='stream')
+    
+    print(f"⚠ {input_file.name}: оценка памяти {megabytes}, файл отложен")
+    return None, dict(plan, route='deferred')
+
+def _convert_input(excel_file, output_path, options):
+    """
+    Конвертирует один Excel или CSV файл в JSON
+    
+    Args:
+        excel_file (Path): Путь к XLS/XLSX/CSV/TSV файлу
+        output_path (Path): Папка для сохранения JSON файла
+        options (dict): Параметры конвертации (см. _conversion_options)
+    
+    Returns:
+        list: Метаданные по каждому сконвертированному листу или один элемент
+            с описанием ошибки (ключ 'error')
+    """
+    try:
+        print(f"\nОбработка файла: {excel_file.name}")
+        
+        if excel_file.suffix.lower() in CSV_SUFFIXES:
+            result = _convert_csv_file(excel_file, output_path, options)
+            print(f"✓ JSON сохранен в: {result['output']}")
+            return [result]
+        
+        if options.get('stream') or options.get('reader') == 'lite':
+            if excel_file.suffix.lower() == '.xlsx':
+                try:
+                    results = _convert_file_streaming(excel_file, output_path, options)
+                    for result in results:
+                        print(f"✓ JSON сохранен в: {result['output']}")
+                    return results
+                except _LiteReaderUnsupported as e:
+                    print(f"⚠ Легковесный читатель не поддерживает {excel_file.name} ({e}), "
+                          f"используется pandas")
+            else:
+                # Формат XLS не поддерживает построчное чтение - читаем через pandas,
+                # но записываем так же порциями
+                print(f"⚠ Потоковое чтение недоступно для {excel_file.suffix}, используется pandas")
+        
+        import pandas as pd
+        
+        profile = options['json_profile']
+        multi_sheet = _is_multi_sheet(options['sheet_name'])
+        results = []
+        
+        # Книга открывается один раз, даже если читается несколько листов
+        with pd.ExcelFile(excel_file) as workbook:
+            for sheet in _select_sheets(workbook.sheet_names, options['sheet_name']):
+                # Чтение листа Excel файла (только столбцы проекции, если она задана)
+                df = _parse_projected(workbook, sheet, options.get('projection'),
+                                      filter_rows=not options.get('typed_schema'))
+                memory = None
+                written_dtypes = None
+                if options.get('lean_dtypes'):
+                    # В JSON пишутся исходные типы: сжатие меняет только память
+                    written_dtypes = df.dtypes.tolist()
+                    df, memory = _lean_dtypes(df)
+                    print(f"  Память DataFrame ({sheet}): {_format_memory_saved(memory)}")
+                
+                # Формируем имя выходного JSON файла
+                output_stem = _sheet_output_stem(excel_file, sheet, multi_sheet)
+                json_file_name = output_stem + output_suffix(profile, options.get('compression'))
+                json_file_path = output_path / json_file_name
+                
+                result = {
+                    'input': str(excel_file),
+                    'output': str(json_file_path),
+                    'sheet': sheet,
+                    'rows': len(df),
+                    'columns': len(df.columns),
+                    'file_name': json_file_name
+                }
+                if memory is not None:
+                    result['memory'] = memory
+                
+                if options.get('typed_schema'):
+                    # Объединение двухстрочного заголовка и типизированные столбцы
+                    table, _ = _typed_table(df, keep_columns=_keep_columns(options))
+                    write_json_atomic(json_file_path, _iter_typed_records(table), profile)
+                    schema = _typed_schema_description(table)
+                    result.update(rows=len(table['id']), columns=len(schema), schema=schema)
+                else:
+                    # Конвертация в JSON и сохранение (порциями, без сборки всей строки)
+                    write_json_atomic(json_file_path, df, profile, dtypes=written_dtypes)
+                
+                print(f"✓ JSON сохранен в: {json_file_path}")
+                
+                if options.get('columnar'):
+                    columns_path = output_path / (output_stem + COLUMNAR_SUFFIX)
+                    if options.get('typed_schema'):
+                        _write_typed_columnar(table, columns_path)
+                    else:
+                        _write_columnar(df, columns_path)
+                    result['columnar'] = str(columns_path)
+                    print(f"✓ Колоночные данные сохранены в: {columns_path}")
+                
+                results.append(result)
+        
+        return results
+        
+    except Exception as e:
+        print(f"✗ Ошибка при обработке файла {excel_file.name}: {e}")
+        return [_error_result(excel_file, str(e))]
+
+def _convert_file(excel_file, output_path, options, memory_budget=None, trace_allocations=False):
+    """
+    Конвертирует один файл с учетом бюджета памяти и измерением пиковой
+    памяти (используется и в пуле процессов)
+    
+    Args:
+        excel_file (Path): Путь к XLS/XLSX/CSV/TSV файлу
+        output_path (Path): Папка для сохранения JSON файла
+        options (dict): Параметры конвертации (см. _conversion_options)
+        memory_budget (int): Бюджет памяти на файл в байтах (None - без ограничения)
+        trace_allocations (bool): Измерять пик выделений через tracemalloc
+    
+    Returns:
+        list: Метаданные листов с ключом 'peak_memory' (и 'memory_plan' при
+            заданном бюджете), один элемент с ключом 'error' при ошибке или
+            с ключом 'deferred', если файл отложен из-за бюджета памяти
+    """
+    plan = None
+    if memory_budget:
+        try:
+            options, plan = _fit_memory_budget(excel_file, options, memory_budget)
         except Exception as e:
             print(f"✗ Ошибка при обработке файла {excel_file.name}: {e}")
+            return [_error_result(excel_file, str(e))]
+        if options is None:
+            return [{
+                'input': str(excel_file),
+                'deferred': True,
+                'memory_plan': plan,
+                'file_name': excel_file.name
+            }]
+    
+    with _MemoryMonitor(trace_allocations) as monitor:
+        results = _convert_input(excel_file, output_path, options)
+    
+    peak_memory = monitor.report()
+    if peak_memory['peak_rss_bytes'] is not None:
+        print(f"  Пиковая память ({excel_file.name}): {peak_memory['peak_rss_bytes'] / 1024 / 1024:.1f} МБ RSS")
+    for result in results:
+        result['peak_memory'] = peak_memory
+        if plan is not None:
+            result['memory_plan'] = plan
     
-    return processed_files
+    return results
 
-# Функция для парсинга одного файла
-def xls_to_json_single(input_file, output_folder, sheet_name=0):
+def _isolated_worker(connection, excel_file, output_path, options, memory_budget, trace_allocations):
+    """
+    Точка входа процесса-обработчика одного файла: результат отправляется
+    родителю через канал
+    """
+    try:
+        results = _convert_file(excel_file, output_path, options, memory_budget, trace_allocations)
+    except BaseException as e:
+        results = [_error_result(excel_file, str(e))]
+    connection.send(results)
+    connection.close()
+
+def _remove_partial_outputs(output_path, pid):
+    """
+    Удаляет временные файлы, оставленные остановленным обработчиком
+    
+    Имена временных файлов начинаются с номера создавшего их процесса (см.
+    json_io.temporary_path), поэтому удаляются только файлы этого
+    обработчика, а не файлы другого запуска, пишущего в ту же папку.
+    """
+    for tmp_path in output_path.glob(f".{pid}-*.tmp"):
+        tmp_path.unlink(missing_ok=True)
+
+def _run_isolated(excel_files, output_path, options, workers, timeout, memory_budget=None,
+                  trace_allocations=False):
+    """
+    Конвертирует каждый файл в отдельном процессе с ограничением времени
+    
+    Одновременно работает не больше workers процессов. Процесс, который не
+    уложился в timeout секунд, принудительно завершается, а файл получает
+    ошибку - зависшая книга не задерживает остальные дольше чем на timeout.
+    Аварийное завершение процесса (например, OOM killer) тоже становится
+    ошибкой только этого файла.
+    
+    Returns:
+        list: Для каждого файла - список метаданных его листов, в порядке excel_files
     """
-    Парсит один XLS/XLSX файл в JSON
+    converted = [None] * len(excel_files)
+    queue = list(enumerate(excel_files))
+    queue.reverse()
+    running = {}
+    
+    def failure(excel_file, message, **extra):
+        print(f"✗ Ошибка при обработке файла {excel_file.name}: {message}")
+        return [_error_result(excel_file, message, **extra)]
+    
+    while queue or running:
+        while queue and len(running) < workers:
+            index, excel_file = queue.pop()
+            receiver, sender = multiprocessing.Pipe(duplex=False)
+            process = multiprocessing.Process(
+                target=_isolated_worker,
+                args=(sender, excel_file, output_path, options, memory_budget, trace_allocations),
+                daemon=True
+            )
+            process.start()
+            sender.close()
+            running[receiver] = (index, excel_file, process, time.monotonic() + timeout)
+        
+        nearest = min(deadline for _, _, _, deadline in running.values())
+        ready = wait_connections(list(running), timeout=max(0.0, nearest - time.monotonic()))
+        
+        for receiver in ready:
+            index, excel_file, process, _ = running.pop(receiver)
+            try:
+                converted[index] = receiver.recv()
+            except EOFError:
+                process.join()
+                converted[index] = failure(
+                    excel_file, f"Процесс-обработчик аварийно завершился (код {process.exitcode})")
+                _remove_partial_outputs(output_path, process.pid)
+            receiver.close()
+            process.join()
+        
+        now = time.monotonic()
+        for receiver, (index, excel_file, process, deadline) in list(running.items()):
+            if deadline > now:
+                continue
+            del running[receiver]
+            process.kill()
+            process.join()
+            receiver.close()
+            converted[index] = failure(excel_file, f"Превышено время обработки ({timeout:g} с)",
+                                       timed_out=True)
+            _remove_partial_outputs(output_path, process.pid)
+    
+    return converted
+
+def _retry_deferred(excel_files, converted, output_path, options, memory_budget,
+                    trace_allocations=False, timeout=None):
+    """
+    Конвертирует файлы, отложенные в пуле процессов, по одному с полным
+    бюджетом памяти
+    
+    В пуле каждый процесс получает долю бюджета, и файл, который не
+    уложился в долю, откладывается. После пула другие процессы уже
+    завершены, поэтому такой файл конвертируется отдельно со всем бюджетом;
+    отложенным остается только файл, оценка которого больше всего бюджета.
+    
+    Returns:
+        list: converted с результатами повторной конвертации
+    """
+    retry = [index for index, results in enumerate(converted) if results and results[0].get('deferred')]
+    if not retry:
+        return converted
+    
+    print(f"\nКонвертация {len(retry)} отложенных файлов по одному с полным бюджетом памяти...")
+    for index in retry:
+        excel_file = excel_files[index]
+        if timeout:
+            converted[index] = _run_isolated([excel_file], output_path, options, 1, timeout,
+                                             memory_budget, trace_allocations)[0]
+        else:
+            converted[index] = _convert_file(excel_file, output_path, options, memory_budget,
+                                             trace_allocations)
+    return converted
+
+def _run_conversions(excel_files, output_path, options, workers=None, memory_budget=None,
+                     trace_allocations=False, timeout=None):
+    """
+    Конвертирует список файлов последовательно или в пуле процессов; с
+    timeout - каждый файл в отдельном процессе (см. _run_isolated)
+    
+    Бюджет памяти делится между одновременно работающими процессами;
+    файлы, которые не уложились в долю процесса, после пула конвертируются
+    по одному с полным бюджетом (см. _retry_deferred).
+    
+    Returns:
+        list: Для каждого файла - список метаданных его листов, в порядке
+            excel_files (не в порядке завершения)
+    """
+    if timeout:
+        max_workers = max(1, min(workers or 1, len(excel_files)))
+        converted = _run_isolated(excel_files, output_path, options, max_workers, timeout,
+                                  memory_budget and memory_budget // max_workers, trace_allocations)
+        if max_workers > 1 and memory_budget:
+            converted = _retry_deferred(excel_files, converted, output_path, options, memory_budget,
+                                        trace_allocations, timeout)
+        return converted
+    
+    if not (workers and workers > 1 and len(excel_files) > 1):
+        return [
+            _convert_file(excel_file, output_path, options, memory_budget, trace_allocations)
+            for excel_file in excel_files
+        ]
+    
+    max_workers = min(workers, len(excel_files))
+    worker_budget = memory_budget and memory_budget // max_workers
+    
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(_convert_file, excel_file, output_path, options,
+                            worker_budget, trace_allocations)
+            for excel_file in excel_files
+        ]
+        converted = []
+        for excel_file, future in zip(excel_files, futures):
+            try:
+                converted.append(future.result())
+            except Exception as e:
+                # Например, аварийное завершение процесса-обработчика
+                print(f"✗ Ошибка при обработке файла {excel_file.name}: {e}")
+                converted.append([_error_result(excel_file, str(e))])
+    
+    if memory_budget:
+        converted = _retry_deferred(excel_files, converted, output_path, options, memory_budget,
+                                    trace_allocations)
+    return converted
+
+def _load_manifest(manifest_path):
+    """
+    Загружает манифест инкрементальной конвертации (пустой, если его нет
+    или он поврежден)
+    """
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if isinstance(manifest.get('files'), dict):
+            return manifest
+    except (FileNotFoundError, json.JSONDecodeError, AttributeError):
+        pass
+    return {'files': {}}
+
+def _save_manifest(manifest_path, manifest):
+    """
+    Сохраняет манифест атомарно: запись во временный файл и переименование
+    """
+    tmp_path = temporary_path(manifest_path)
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+def _outputs_exist(results):
+    """
+    Проверяет, что все выходные файлы из метаданных конвертации на месте
+    """
+    for result in results:
+        if not Path(result['output']).exists():
+            return False
+        if result.get('columnar') and not Path(result['columnar']).exists():
+            return False
+    return True
+
+def _link_or_copy(source, target):
+    """
+    Создает target как жесткую ссылку на source, а если ссылка невозможна
+    (другая файловая система, нет поддержки ссылок) - как копию
+    
+    Ссылка не занимает места на диске повторно. Выходные файлы не
+    перезаписываются на месте (JSON заменяется через os.replace, папка
+    .columns создается заново), поэтому новая конвертация оригинала не
+    меняет файлы дубликата.
+    
+    Returns:
+        bool: True, если создана ссылка, False - копия
+    """
+    target = Path(target)
+    target.unlink(missing_ok=True)
+    try:
+        os.link(source, target)
+        return True
+    except OSError:
+        shutil.copyfile(source, target)
+        return False
+
+def _link_converted(results, excel_file, output_path):
+    """
+    Создает выходные файлы для книги-дубликата жесткими ссылками на уже
+    готовые результаты (или их копиями) вместо повторного разбора Excel
+    
+    Returns:
+        list: Метаданные листов для файла-дубликата
+    """
+    linked = []
+    for result in results:
+        # Имя вида <книга>[__<лист>].json: меняется только имя книги
+        source_stem = Path(result['input']).stem
+        source = Path(result['output'])
+        json_file_name = excel_file.stem + source.name[len(source_stem):]
+        json_file_path = output_path / json_file_name
+        
+        if source.resolve() != json_file_path.resolve():
+            _link_or_copy(source, json_file_path)
+        
+        link = dict(result, input=str(excel_file), output=str(json_file_path), file_name=json_file_name)
+        
+        if result.get('columnar'):
+            columns_source = Path(result['columnar'])
+            columns_path = output_path / (excel_file.stem + columns_source.name[len(source_stem):])
+            if columns_source.resolve() != columns_path.resolve():
+                shutil.copytree(columns_source, columns_path, copy_function=_link_or_copy,
+                                dirs_exist_ok=True)
+            link['columnar'] = str(columns_path)
+        
+        linked.append(link)
+    
+    return linked
+
+def xls_to_json_batch(input_folder, output_folder, sheet_name=0, workers=None, stream=False,
+                      incremental=False, columnar=False, typed_schema=False, json_profile=None,
+                      reader='pandas', chunk_size=CSV_CHUNK_SIZE, lean_dtypes=False,
+                      projection=None, compression=None, memory_budget_mb=None,
+                      trace_allocations=False, timeout=None):
+    """
+    Парсер всех XLS/XLSX и CSV/TSV файлов из папки в JSON файлы в другую папку
     
     Args:
-        input_file (str): Путь к XLS/XLSX файлу
-        output_folder (str): Путь к папке для сохранения JSON файла
-        sheet_name (int/str): Номер или имя листа для чтения
+        input_folder (str): Путь к папке с XLS/XLSX/CSV/TSV файлами
+        output_folder (str): Путь к папке для сохранения JSON файлов
+        sheet_name (int/str/list/None): Номер или имя листа для чтения
+            (по умолчанию: 0). Список номеров/имен или None (все листы) - книга
+            открывается один раз, каждый лист сохраняется в отдельный файл
+            <имя книги>__<имя листа>.json
+        workers (int): Количество процессов для параллельной конвертации
+            (по умолчанию: None - файлы обрабатываются последовательно)
+        stream (bool): Потоковый режим - строки читаются по одной и сразу
+            записываются в файл (по умолчанию JSON Lines, .jsonl); память не
+            растет с числом строк
+        incremental (bool): Инкрементальный режим - в выходной папке ведется
+            манифест (хеш содержимого, mtime, размер, выходной файл) и
+            конвертируются только новые и измененные книги
+        columnar (bool): Дополнительно к JSON сохранить данные в колоночном
+            формате NumPy (папка <имя>.columns с .npy на каждый столбец и
+            schema.json); анализатор предпочитает этот формат JSON
+        typed_schema (bool): Распознать двухстрочный заголовок и сохранить
+            данные в типизированной схеме TYPED_SCHEMA (id, name, revenue,
+            quarters) без строки подзаголовков и строк без номера
+        json_profile (str): Профиль вывода: 'pretty' (отступы), 'compact'
+            (без пробелов) или 'jsonl' (JSON Lines, расширение .jsonl).
+            По умолчанию 'pretty', а в потоковом режиме - 'jsonl'.
+            Записи пишутся в файл порциями, без сборки всей строки в памяти.
+        reader (str): Читатель XLSX: 'pandas' (pd.read_excel) или 'lite' -
+            встроенный легковесный читатель на zipfile и iterparse, который не
+            импортирует pandas. Для книг с датами и других неподдерживаемых
+            возможностей 'lite' автоматически переключается на pandas.
+        chunk_size (int): Число строк CSV/TSV в одной порции (память при
+            конвертации CSV ограничена размером порции)
+        lean_dtypes (bool): Экономный режим памяти для DataFrame: целые №,
+            float32 вместо float64 (только без потери точности),
+            категориальные наименования. JSON не меняется: он
+            записывается с исходными типами столбцов. Экономия
+            памяти выводится и сохраняется в метаданных ('memory'). Не
+            влияет на потоковое чтение, где DataFrame не создается.
+        projection (dict): Столбцы и условие на строки, которые нужны
+            потребителю данных, например analyzer.ANALYSIS_PROJECTION:
+            {'columns': [...], 'numeric_columns': [...]}. Читаются только
+            столбцы 'columns' (usecols), строки без чисел в 'numeric_columns'
+            отбрасываются до записи JSON. В типизированной схеме строки
+            фильтруются самой схемой. Если на листе нет каких-то столбцов
+            проекции, лист читается целиком. Необязательный список
+            'keep_columns' (например, столбцы группировки анализа, см.
+            analyzer.analysis_projection) читается, если столбцы есть на
+            листе, и сохраняется и в типизированной схеме.
+        compression (str): Сжатие выходных JSON файлов: None, 'gzip'
+            (.json.gz) или 'xz' (.json.xz); анализатор читает такие файлы
+            без распаковки на диск
+        memory_budget_mb (float): Бюджет памяти на конвертацию в МБ (при
+            workers - на все процессы вместе, каждый получает долю). Память
+            каждого файла оценивается заранее по размерам данных; если
+            оценка больше бюджета, XLSX читается потоково, у CSV
+            уменьшается порция, а остальные файлы откладываются. Файлы,
+            не уложившиеся в долю процесса, после пула конвертируются по
+            одному с полным бюджетом; отложенными (ключ 'deferred', в
+            манифест не попадают) остаются только файлы, оценка которых
+            больше всего бюджета - их нужно конвертировать с большим
+            бюджетом
+        trace_allocations (bool): Дополнительно к пиковому RSS измерять пик
+            выделений памяти через tracemalloc (точнее, но медленнее)
+        timeout (float): Ограничение времени на файл в секундах. Каждый файл
+            конвертируется в отдельном процессе; зависший процесс
+            завершается, и файл попадает в результат с ошибкой (ключи
+            'error' и 'timed_out'). Аварийное завершение процесса также
+            становится ошибкой только этого файла.
     
     Returns:
-        dict: Метаданные обработанного файла или None в случае ошибки
+        list: Список обработанных файлов с метаданными (по одному элементу на
+            лист, с именем листа 'sheet' и числом строк 'rows' и столбцов
+            'columns'). Файлы, которые не удалось обработать, содержат ключ
+            'error'. Порядок списка совпадает с порядком файлов (по имени)
+            и листов и не зависит от числа процессов.
+            В инкрементальном режиме неизмененные файлы помечены ключом
+            'skipped', а дубликаты - ключом 'linked_from'.
+            Пиковая память обработки файла - в ключе 'peak_memory'
+            ({'rss_before_bytes', 'peak_rss_bytes'[, 'peak_traced_bytes']}).
     """
-    input_path = Path(input_file)
+    # Создаем объекты Path для удобной работы с путями
+    input_path = Path(input_folder)
     output_path = Path(output_folder)
     
+    # Проверяем существование входной папки
     if not input_path.exists():
-        raise FileNotFoundError(f"Файл {input_file} не найден!")
+        raise FileNotFoundError(f"Папка {input_folder} не найдена!")
     
+    # Создаем выходную папку, если она не существует
     output_path.mkdir(parents=True, exist_ok=True)
     
-    try:
-        print(f"Обработка файла: {input_path.name}")
-        
-        df = pd.read_excel(input_path, sheet_name=sheet_name)
+    # Получаем список всех XLS/XLSX и CSV/TSV файлов (сортировка дает детерминированный порядок)
+    excel_files = [
+        path
+        for suffix in INPUT_SUFFIXES
+        for path in sorted(input_path.glob(f"*{suffix}"))
+    ]
+    
+    if not excel_files:
+        print("⚠ Входная папка не содержит XLS/XLSX/CSV файлов!")
+        return []
+    
+    print(f"Найдено {len(excel_files)} файлов для обработки:")
+    
+    options = _conversion_options(sheet_name, stream, columnar, typed_schema, json_profile, reader,
+                                  chunk_size, lean_dtypes, projection, compression)
+    
+    memory_budget = int(memory_budget_mb * 1024 * 1024) if memory_budget_mb else None
+    
+    if not incremental:
+        converted = _run_conversions(excel_files, output_path, options, workers,
+                                     memory_budget, trace_allocations, timeout)
+        return [result for results in converted for result in results]
+    
+    # Инкрементальный режим: конвертируются только новые и измененные файлы
+    manifest_path = output_path / MANIFEST_FILE_NAME
+    manifest = _load_manifest(manifest_path)
+    known = manifest['files']
+    
+    def is_reusable(entry):
+        return (
+            entry is not None
+            and entry.get('options') == options
+            and 'results' in entry
+            and _outputs_exist(entry['results'])
+        )
+    
+    # Индекс уже сконвертированного содержимого: хеш -> запись манифеста
+    by_hash = {entry['sha256']: entry for entry in known.values() if is_reusable(entry)}
+    
+    processed_files = [None] * len(excel_files)
+    entries = {}
+    pending = []
+    
+    for index, excel_file in enumerate(excel_files):
+        stat = excel_file.stat()
+        entry = known.get(excel_file.name)
+        up_to_date = is_reusable(entry)
         
-        json_file_name = input_path.stem + ".json"
-        json_file_path = output_path / json_file_name
+        # Быстрая проверка без чтения файла: размер и время изменения не менялись
+        if up_to_date and entry['mtime'] == stat.st_mtime and entry['size'] == stat.st_size:
+            print(f"• Без изменений: {excel_file.name}")
+            entries[excel_file.name] = entry
+            processed_files[index] = [dict(result, skipped=True) for result in entry['results']]
+            continue
         
-        json_data = df.to_json(orient='records', force_ascii=False, indent=2)
+        sha256 = file_sha256(excel_file)
         
-        with open(json_file_path, 'w', encoding='utf-8') as f:
-            f.write(json_data)
+        if up_to_date and entry['sha256'] == sha256:
+            # Файл перезаписан тем же содержимым - обновляем только mtime
+            print(f"• Без изменений (содержимое совпадает): {excel_file.name}")
+            entries[excel_file.name] = dict(entry, mtime=stat.st_mtime, size=stat.st_size)
+            processed_files[index] = [dict(result, skipped=True) for result in entry['results']]
+            continue
         
-        print(f"✓ JSON сохранен в: {json_file_path}")
+        new_entry = {'sha256': sha256, 'mtime': stat.st_mtime, 'size': stat.st_size, 'options': options}
+        duplicate = by_hash.get(sha256)
         
-        return {
-            'input': str(input_path),
-            'output': str(json_file_path),
-            'rows': len(df),
-            'columns': len(df.columns),
-            'file_name': json_file_name
-        }
+        if duplicate is not None:
+            # Байт-в-байт совпадает с уже сконвертированной книгой - копируем результат
+            processed_files[index] = _link_duplicate(duplicate, excel_file, output_path)
+            entries[excel_file.name] = dict(new_entry, results=processed_files[index])
+            continue
         
-    except Exception as e:
-        print(f"✗ Ошибка при обработке файла {input_path.name}: {e}")
-        return None
\ No newline at end of file
+        pending.append((index, excel_file, new_entry))
+    
+    # Одинаковые файлы внутри одного запуска: конвертируется только первый,
+    # остальные получают копию его результата
+    originals = {}
+    for item in pending:
+        originals.setdefault(item[2]['sha256'], item)
+    originals = list(originals.values())
+    
+    converted = _run_conversions([item[1] for item in originals], output_path, options, workers,
+                                 memory_budget, trace_allocations, timeout)
+    
+    deferred = {}
+    for (index, excel_file, new_entry), results in zip(originals, converted):
+        processed_files[index] = results
+        if results[0].get('deferred'):
+            # Отложенный файл (больше всего бюджета) не попадает в манифест
+            deferred[new_entry['sha256']] = results[0]
+        elif not any('error' in result for result in results):
+            entries[excel_file.name] = dict(new_entry, results=results)
+            by_hash[new_entry['sha256']] = entries[excel_file.name]
+    
+    for index, excel_file, new_entry in pending:
+        if processed_files[index] is not None:
+            continue
+        if new_entry['sha256'] in deferred:
+            processed_files[index] = [dict(deferred[new_entry['sha256']], input=str(excel_file),
+                                           file_name=excel_file.name)]
+            continue
+        duplicate = by_hash.get(new_entry['sha256'])
+        if duplicate is None:
+            # Оригинал не удалось сконвертировать - у копии будет та же ошибка
+            processed_files[index] = [_error_result(excel_file, "Не удалось сконвертировать идентичный файл")]
+            continue
+        processed_files[index] = _link_duplicate(duplicate, excel_file, output_path)
+        entries[excel_file.name] = dict(new_entry, results=processed_files[index])
+    
+    # Записи об удаленных входных файлах в манифест не переносятся
+    _save_manifest(manifest_path, {'files': entries})
+    
+    return [result for results in processed_files for result in results]
+
+def _link_duplicate(duplicate, excel_file, output_path):
+    """
+    Связывает результаты книги-оригинала с дубликатом (жесткие ссылки, см.
+    _link_converted) и помечает их ключом 'linked_from'
+    """
+    source_input = duplicate['results'][0]['input']
+    print(f"• Дубликат {Path(source_input).name}: {excel_file.name}")
+    results = _link_converted(duplicate['results'], excel_file, output_path)
+    return [dict(result, linked_from=source_input) for result in results]
+
+# Функция для парсинга одного файла
+def xls_to_json_single(input_file, output_folder, sheet_name=0, stream=False, columnar=False,
+                       typed_schema=False, json_profile=None, reader='pandas',
+                       chunk_size=CSV_CHUNK_SIZE, lean_dtypes=False, projection=None,
+                       compression=None, trace_allocations=False):
+    """
+    Парсит один XLS/XLSX или CSV/TSV файл в JSON
+    
+    Args:
+        input_file (str): Путь к XLS/XLSX/CSV/TSV файлу
+        output_folder (str): Путь к папке для сохранения JSON файла
+        sheet_name (int/str/list/None): Номер или имя листа для чтения, список
+            листов или None для всех листов
+        stream (bool): Потоковый режим с записью по мере чтения строк
+        columnar (bool): Дополнительно сохранить колоночный формат NumPy
+        typed_schema (bool): Сохранить данные в типизированной схеме TYPED_SCHEMA
+        json_profile (str): Профиль вывода ('pretty', 'compact', 'jsonl')
+        reader (str): Читатель XLSX: 'pandas' или легковесный 'lite'
+        chunk_size (int): Число строк CSV/TSV в одной порции
+        lean_dtypes (bool): Экономный режим памяти для DataFrame (см. xls_to_json_batch)
+        projection (dict): Нужные столбцы и строки (см. xls_to_json_batch)
+        compression (str): Сжатие выходного файла: None, 'gzip' или 'xz'
+        trace_allocations (bool): Измерять пик выделений памяти через tracemalloc
+    
+    Returns:
+        dict: Метаданные обработанного файла или None в случае ошибки.
+            Если запрошено несколько листов - список метаданных по листам.
+            Пиковая память обработки - в ключе 'peak_memory'.
+    """
+    options = _conversion_options(sheet_name, stream, columnar, typed_schema, json_profile, reader,
+                                  chunk_size, lean_dtypes, projection, compression)
+    
+    input_path = Path(input_file)
+    output_path = Path(output_folder)
+    
+    if not input_path.exists():
+        raise FileNotFoundError(f"Файл {input_file} не найден!")
+    
+    output_path.mkdir(parents=True, exist_ok=True)
+    
+    results = _convert_file(input_path, output_path, options, trace_allocations=trace_allocations)
+    
+    if 'error' in results[0]:
+        return None
+    
+    if _is_multi_sheet(sheet_name):
+        return results
+    
+    return results[0]
@@ -0,0 +1,338 @@
+import math
+import random
+from analyzer import ABC_THRESHOLDS, RunningVariance, _iter_normalized
+from json_io import iter_json_records
+
+class _TreapNode:
+    """
+    Узел декартова дерева: ключ (-выручка, порядковый номер товара) и сумма
+    выручки поддерева
+    """
+    __slots__ = ('key', 'revenue', 'priority', 'left', 'right', 'sum')
+    
+    def __init__(self, key, revenue):
+        self.key = key
+        self.revenue = revenue
+        self.priority = random.random()
+        self.left = None
+        self.right = None
+        self.sum = revenue
+    
+    def update(self):
+        self.sum = ((self.left.sum if self.left else 0) + self.revenue
+                    + (self.right.sum if self.right else 0))
+
+def _treap_split(node, key):
+    """
+    Делит дерево на ключи <= key и ключи > key
+    """
+    if node is None:
+        return None, None
+    if node.key <= key:
+        node.right, right = _treap_split(node.right, key)
+        node.update()
+        return node, right
+    left, node.left = _treap_split(node.left, key)
+    node.update()
+    return left, node
+
+def _treap_merge(left, right):
+    """
+    Объединяет деревья, все ключи left меньше ключей right
+    """
+    if left is None or right is None:
+        return left or right
+    if left.priority > right.priority:
+        left.right = _treap_merge(left.right, right)
+        left.update()
+        return left
+    right.left = _treap_merge(left, right.left)
+    right.update()
+    return right
+
+def _treap_build(nodes):
+    """
+    Строит дерево из узлов, отсортированных по ключу, за O(n)
+    """
+    stack = []
+    for node in nodes:
+        last = None
+        while stack and stack[-1].priority < node.priority:
+            last = stack.pop()
+        node.left = last
+        if stack:
+            stack[-1].right = node
+        stack.append(node)
+    
+    # Суммы поддеревьев - обход в обратном порядке (дети раньше родителей)
+    order = []
+    pending = stack[:1]
+    while pending:
+        node = pending.pop()
+        order.append(node)
+        pending.extend(child for child in (node.left, node.right) if child)
+    for node in reversed(order):
+        node.update()
+    return stack[0] if stack else None
+
+def _treap_range(node, low, high):
+    """
+    Узлы с ключами low < key <= high по возрастанию ключа
+    """
+    while node is not None:
+        if node.key <= low:
+            node = node.right
+        elif node.key > high:
+            node = node.left
+        else:
+            yield from _treap_range(node.left, low, high)
+            yield node
+            node = node.right
+
+# Граница класса, когда в класс не попадает ни один товар: меньше любого ключа
+_NO_BOUNDARY = (-math.inf, -1)
+
+class IncrementalAbcXyz:
+    """
+    ABC-XYZ анализ с обновлением отдельных товаров без полного пересчета
+    
+    Товары хранятся в декартовом дереве (treap) по ключу (-выручка, номер
+    товара) с суммой выручки в каждом поддереве: вставка, удаление и поиск
+    границы класса (последнего товара, у которого накопленная доля выручки
+    не превышает порога ABC_THRESHOLDS) выполняются за O(log n). Класс XYZ
+    зависит только от периодов самого товара: для каждого товара хранится
+    RunningVariance, поэтому новые периоды можно добавлять по мере
+    поступления (add_periods), не храня историю.
+    
+    После изменения товара (upsert, remove) заново классифицируются только
+    товары между прежней и новой границей классов - то есть те, чья
+    накопленная доля действительно перешла порог. Классы совпадают с
+    perform_abc_xyz_analysis для того же набора товаров (с точностью до
+    округления сумм float на самой границе); при одинаковой выручке
+    сохраняется порядок добавления товаров, как в исходном файле.
+    Если общая выручка не больше 0, все товары относятся к классу C.
+    
+    Пример:
+        analysis = IncrementalAbcXyz.from_file('output_json/data1.json')
+        changes = analysis.upsert(17, 5200.0, [1200, 1300, 1250, 1450])
+        changes += analysis.add_periods(17, [1400])
+        print(analysis.classify(17), changes)
+    """
+    
+    def __init__(self, items=()):
+        """
+        Args:
+            items (iterable): Нормализованные записи {'id', 'name', 'revenue',
+                'quarters'}; ID товаров должны быть уникальны (при повторе
+                действует последняя запись)
+        """
+        self._items = {}
+        self._sequence = 0
+        
+        for item in items:
+            self._items.pop(item['id'], None)
+            self._items[item['id']] = self._new_state(item['name'], item['revenue'], item['quarters'])
+        
+        self._root = _treap_build(sorted((state['node'] for state in self._items.values()),
+                                         key=lambda node: node.key))
+        # Ключ узла -> ID товара
+        self._nodes = {state['node'].key: item_id for item_id, state in self._items.items()}
+        self._boundaries = self._find_boundaries()
+        for state in self._items.values():
+            state['ABC'] = self._abc_class(state['node'].key)
+    
+    @classmethod
+    def from_file(cls, json_file_path, period_columns=None):
+        """
+        Создает анализ по файлу с данными (JSON или JSON Lines, в том числе
+        сжатому), читая записи потоком; period_columns - см. perform_abc_xyz_analysis
+        """
+        return cls(_iter_normalized(iter_json_records(json_file_path), period_columns))
+    
+    def __len__(self):
+        return len(self._items)
+    
+    def __contains__(self, item_id):
+        return item_id in self._items
+    
+    @property
+    def total_revenue(self):
+        return self._root.sum if self._root else 0
+    
+    def _new_state(self, name, revenue, quarters):
+        self._sequence += 1
+        state = {
+            'name': name,
+            'revenue': revenue,
+            'periods': RunningVariance().update(quarters),
+            'XYZ': None,
+            'ABC': None,
+            'node': _TreapNode((-revenue, self._sequence), revenue)
+        }
+        state['XYZ'] = state['periods'].xyz_class()
+        return state
+    
+    def _boundary(self, threshold):
+        """
+        Ключ последнего товара, у которого накопленная доля выручки не
+        больше threshold (%): спуск по суммам поддеревьев за O(log n)
+        """
+        total_revenue = self.total_revenue
+        if total_revenue <= 0:
+            return _NO_BOUNDARY
+        
+        boundary = _NO_BOUNDARY
+        cumulative = 0
+        node = self._root
+        while node is not None:
+            left = node.left.sum if node.left else 0
+            if ((cumulative + left + node.revenue) / total_revenue) * 100 <= threshold:
+                boundary = node.key
+                cumulative += left + node.revenue
+                node = node.right
+            else:
+                node = node.left
+        return boundary
+    
+    def _find_boundaries(self):
+        return tuple(self._boundary(threshold) for threshold in ABC_THRESHOLDS)
+    
+    def _abc_class(self, key):
+        if key <= self._boundaries[0]:
+            return 'A'
+        elif key <= self._boundaries[1]:
+            return 'B'
+        return 'C'
+    
+    def _insert(self, node, item_id):
+        left, right = _treap_split(self._root, node.key)
+        self._root = _treap_merge(_treap_merge(left, node), right)
+        self._nodes[node.key] = item_id
+    
+    def _delete(self, node):
+        left, right = _treap_split(self._root, node.key)
+        left, _ = _treap_split(left, (node.key[0], node.key[1] - 1))
+        self._root = _treap_merge(left, right)
+        del self._nodes[node.key]
+    
+    def _reclassify(self, before):
+        """
+        Обновляет границы классов и классы ABC товаров, перешедших границу
+        
+        Args:
+            before (dict): ID измененного товара -> его класс ABC-XYZ до изменения
+        
+        Returns:
+            list: Изменения классов [{'id', 'before', 'after'}] (ABC_XYZ)
+        """
+        previous = self._boundaries
+        self._boundaries = self._find_boundaries()
+        
+        for old, new in zip(previous, self._boundaries):
+            for node in _treap_range(self._root, min(old, new), max(old, new)):
+                item_id = self._nodes[node.key]
+                before.setdefault(item_id, self._cell(item_id))
+        
+        changes = []
+        for item_id, cell in before.items():
+            state = self._items[item_id]
+            state['ABC'] = self._abc_class(state['node'].key)
+            if self._cell(item_id) != cell:
+                changes.append({'id': item_id, 'before': cell, 'after': self._cell(item_id)})
+        return changes
+    
+    def _cell(self, item_id):
+        state = self._items[item_id]
+        return state['ABC'] + state['XYZ'] if state['ABC'] else None
+    
+    def upsert(self, item_id, revenue, quarters=None, name=None):
+        """
+        Добавляет товар или изменяет его выручку и периоды
+        
+        Args:
+            item_id: ID товара
+            revenue (float): Выручка
+            quarters (list): Выручка по периодам (заменяет прежнюю историю;
+                None - история не меняется)
+            name (str): Наименование (по умолчанию - прежнее)
+        
+        Returns:
+            list: Изменения классов [{'id', 'before', 'after'}], в том числе
+                у других товаров, перешедших границу класса; before = None
+                у нового товара
+        """
+        state = self._items.get(item_id)
+        if state is None:
+            before = {item_id: None}
+            state = self._items[item_id] = self._new_state(name or '', revenue, quarters or ())
+            self._insert(state['node'], item_id)
+        else:
+            before = {item_id: self._cell(item_id)}
+            node = state['node']
+            if node.revenue != revenue:
+                # Порядок товара среди товаров с равной выручкой сохраняется
+                self._delete(node)
+                state['node'] = node = _TreapNode((-revenue, node.key[1]), revenue)
+                self._insert(node, item_id)
+            state['revenue'] = revenue
+            if quarters is not None:
+                state['periods'] = RunningVariance().update(quarters)
+                state['XYZ'] = state['periods'].xyz_class()
+            if name is not None:
+                state['name'] = name
+        
+        return self._reclassify(before)
+    
+    def add_periods(self, item_id, values):
+        """
+        Добавляет к истории товара значения новых периодов (класс ABC не
+        меняется, пересчитывается только XYZ товара)
+        
+        Args:
+            item_id: ID товара
+            values (iterable): Выручка по новым периодам
+        
+        Returns:
+            list: Изменение класса товара [{'id', 'before', 'after'}] или []
+        """
+        state = self._items[item_id]
+        before = self._cell(item_id)
+        state['XYZ'] = state['periods'].update(values).xyz_class()
+        after = self._cell(item_id)
+        return [{'id': item_id, 'before': before, 'after': after}] if after != before else []
+    
+    def remove(self, item_id):
+        """
+        Удаляет товар
+        
+        Returns:
+            list: Изменения классов других товаров [{'id', 'before', 'after'}]
+        """
+        state = self._items.pop(item_id)
+        self._delete(state['node'])
+        return self._reclassify({})
+    
+    def classify(self, item_id):
+        """
+        Класс ABC-XYZ товара ('AX', ..., 'CZ')
+        """
+        return self._cell(item_id)
+    
+    def results(self):
+        """
+        Записи результата в формате perform_abc_xyz_analysis (по убыванию выручки)
+        
+        Yields:
+            dict: {'id', 'name', 'revenue', 'ABC', 'XYZ', 'ABC_XYZ'}
+        """
+        for node in _treap_range(self._root, _NO_BOUNDARY, (math.inf, math.inf)):
+            item_id = self._nodes[node.key]
+            state = self._items[item_id]
+            yield {
+                'id': int(item_id),
+                'name': state['name'],
+                'revenue': state['revenue'],
+                'ABC': state['ABC'],
+                'XYZ': state['XYZ'],
+                'ABC_XYZ': state['ABC'] + state['XYZ']
+            }
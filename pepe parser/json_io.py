@@ -0,0 +1,388 @@
+import gzip
+import hashlib
+import itertools
+import json
+import lzma
+import os
+import uuid
+from pathlib import Path
+
+# Профили вывода JSON:
+#   pretty - массив с отступами (прежний формат, удобен для просмотра)
+#   compact - массив без пробелов и переносов строк
+#   jsonl - JSON Lines, одна запись на строку
+JSON_PROFILES = ('pretty', 'compact', 'jsonl')
+
+# Сколько записей сериализуется и записывается в файл за один раз
+DEFAULT_CHUNK_SIZE = 10000
+
+# Сжатие выходных файлов (стандартная библиотека): расширение добавляется
+# после расширения профиля - data.json.gz, data.jsonl.xz
+COMPRESSION_SUFFIXES = {None: '', 'gzip': '.gz', 'xz': '.xz'}
+
+# Колоночный формат парсера (читается анализатором): папка <имя файла>.columns
+# рядом с JSON, со схемой schema.json и .npy на каждый столбец
+COLUMNAR_SUFFIX = '.columns'
+COLUMNAR_SCHEMA_FILE = 'schema.json'
+
+# Уровень gzip: почти тот же размер, что и максимальный 9, но заметно быстрее
+GZIP_LEVEL = 6
+
+# Даты во всех путях записи - строки ISO 8601 с точностью до секунды
+# ("2020-01-02T03:04:05"), как DataFrame.to_json(date_format='iso', date_unit='s')
+DATAFRAME_JSON_OPTIONS = {'orient': 'records', 'force_ascii': False, 'date_format': 'iso', 'date_unit': 's'}
+
+def json_default(value):
+    """
+    Сериализация значений, которые не поддерживает модуль json
+    (даты, время, Decimal); даты и время - ISO 8601 без долей секунды,
+    как в записи DataFrame (DATAFRAME_JSON_OPTIONS)
+    """
+    if hasattr(value, 'isoformat'):
+        if getattr(value, 'microsecond', 0):
+            value = value.replace(microsecond=0)
+        return value.isoformat()
+    return str(value)
+
+def file_sha256(file_path, chunk_size=1024 * 1024):
+    """
+    Вычисляет SHA-256 содержимого файла, читая его блоками
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def output_suffix(profile, compression=None):
+    """
+    Расширение выходного файла для профиля и сжатия: .json, .jsonl, .json.gz, ...
+    """
+    return ('.jsonl' if profile == 'jsonl' else '.json') + COMPRESSION_SUFFIXES[compression]
+
+def output_patterns():
+    """
+    Шаблоны glob для всех выходных файлов (все профили, со сжатием и без)
+    """
+    return [
+        f"*{output_suffix(profile, compression)}"
+        for compression in COMPRESSION_SUFFIXES
+        for profile in ('pretty', 'jsonl')
+    ]
+
+def check_compression(compression):
+    """
+    Проверяет вид сжатия
+    """
+    if compression not in COMPRESSION_SUFFIXES:
+        allowed = ', '.join(str(name) for name in COMPRESSION_SUFFIXES)
+        raise ValueError(f"Неизвестное сжатие '{compression}', допустимые: {allowed}")
+    return compression
+
+def _split_compression(file_path):
+    """
+    Имя файла без расширения сжатия и вид сжатия; временный суффикс .tmp
+    (запись с последующим os.replace) не учитывается
+    """
+    name = Path(file_path).name
+    if name.endswith('.tmp'):
+        name = name[:-len('.tmp')]
+    for compression, suffix in COMPRESSION_SUFFIXES.items():
+        if suffix and name.endswith(suffix):
+            return name[:-len(suffix)], compression
+    return name, None
+
+def output_stem(file_path):
+    """
+    Имя выходного файла без расширений профиля и сжатия: data.jsonl.gz -> data
+    """
+    name, _ = _split_compression(file_path)
+    for suffix in ('.jsonl', '.json'):
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return Path(name).stem
+
+def is_json_lines(file_path):
+    """
+    Файл в формате JSON Lines (.jsonl, в том числе сжатый)
+    """
+    return _split_compression(file_path)[0].endswith('.jsonl')
+
+def open_json_file(file_path, mode='r'):
+    """
+    Открывает JSON файл в текстовом режиме UTF-8; файлы .gz и .xz
+    сжимаются при записи и распаковываются потоком при чтении
+
+    Args:
+        file_path (str/Path): Путь к файлу
+        mode (str): 'r' или 'w'
+
+    Returns:
+        file: Текстовый файловый объект
+    """
+    _, compression = _split_compression(file_path)
+    if compression == 'gzip':
+        return gzip.open(file_path, mode + 't', compresslevel=GZIP_LEVEL, encoding='utf-8')
+    if compression == 'xz':
+        return lzma.open(file_path, mode + 't', encoding='utf-8')
+    return open(file_path, mode, encoding='utf-8')
+
+def check_profile(profile):
+    """
+    Проверяет имя профиля вывода
+    """
+    if profile not in JSON_PROFILES:
+        raise ValueError(f"Неизвестный профиль JSON '{profile}', допустимые: {', '.join(JSON_PROFILES)}")
+    return profile
+
+class JsonRecordWriter:
+    """
+    Записывает последовательность записей в открытый текстовый файл порциями
+
+    Записи не собираются в одну строку: каждая порция (chunk_size записей)
+    сериализуется и сразу пишется в файл, поэтому память не зависит от
+    общего числа записей. Профиль pretty дает тот же текст, что и
+    json.dump(records, indent=2) / DataFrame.to_json(indent=2).
+
+    Пример:
+        with open(path, 'w', encoding='utf-8') as f:
+            with JsonRecordWriter(f, 'compact') as writer:
+                writer.write_records(records)
+    """
+
+    # (начало файла, разделитель записей, конец файла)
+    _FRAMING = {
+        'pretty': ('[\n', ',\n', '\n]'),
+        'compact': ('[', ',', ']'),
+        'jsonl': ('', '\n', '\n')
+    }
+
+    def __init__(self, f, profile='pretty', chunk_size=DEFAULT_CHUNK_SIZE):
+        self.f = f
+        self.profile = check_profile(profile)
+        self.chunk_size = chunk_size
+        self.records = 0
+        self.bytes_written = 0
+        self._started = False
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+
+    def _write(self, text):
+        self.f.write(text)
+        self.bytes_written += len(text.encode('utf-8'))
+
+    def write_chunk(self, body, count):
+        """
+        Записывает готовую порцию записей
+
+        Args:
+            body (str): Записи, уже сериализованные в формате профиля и
+                соединенные его разделителем (без скобок массива)
+            count (int): Число записей в порции
+        """
+        if not count:
+            return
+        start, separator, _ = self._FRAMING[self.profile]
+        self._write(separator if self._started else start)
+        self._write(body)
+        self._started = True
+        self.records += count
+
+    def _dumps_chunk(self, chunk):
+        # Порция сериализуется одним вызовом json.dumps (как прежний
+        # json.dump всего массива), затем у массива отрезаются скобки
+        if self.profile == 'pretty':
+            return json.dumps(chunk, ensure_ascii=False, indent=2, default=json_default)[2:-2]
+        if self.profile == 'compact':
+            return json.dumps(chunk, ensure_ascii=False, separators=(',', ':'), default=json_default)[1:-1]
+        return '\n'.join(json.dumps(record, ensure_ascii=False, default=json_default) for record in chunk)
+
+    def write_records(self, records):
+        """
+        Сериализует и записывает записи (dict) порциями по chunk_size
+
+        Args:
+            records (iterable): Записи; может быть генератором
+        """
+        iterator = iter(records)
+        for chunk in iter(lambda: list(itertools.islice(iterator, self.chunk_size)), []):
+            self.write_chunk(self._dumps_chunk(chunk), len(chunk))
+
+    def write_dataframe(self, df, dtypes=None):
+        """
+        Записывает DataFrame порциями строк через DataFrame.to_json
+        (даты - строками ISO 8601, как у записей, см. DATAFRAME_JSON_OPTIONS)
+
+        Args:
+            df (DataFrame): Данные
+            dtypes (list): Типы столбцов для записи по позициям (например,
+                исходные типы до сжатия памяти); каждая порция приводится к
+                ним перед сериализацией, поэтому JSON не зависит от типов в памяти
+        """
+        for start in range(0, len(df), self.chunk_size):
+            chunk = df.iloc[start:start + self.chunk_size]
+            if dtypes is not None:
+                chunk = _cast_columns(chunk, dtypes)
+            if self.profile == 'jsonl':
+                body = chunk.to_json(lines=True, **DATAFRAME_JSON_OPTIONS).rstrip('\n')
+            elif self.profile == 'pretty':
+                # "[\n  {...},\n  {...}\n]" -> тело массива без скобок
+                body = chunk.to_json(indent=2, **DATAFRAME_JSON_OPTIONS)[2:-2]
+            else:
+                body = chunk.to_json(**DATAFRAME_JSON_OPTIONS)[1:-1]
+            self.write_chunk(body, len(chunk))
+
+    def close(self):
+        """
+        Завершает массив (или пустой файл JSON Lines)
+        """
+        if self._closed:
+            return
+        self._closed = True
+        if self._started:
+            self._write(self._FRAMING[self.profile][2])
+        elif self.profile != 'jsonl':
+            self._write('[]')
+
+def _cast_columns(df, dtypes):
+    # Приводятся только столбцы, тип которых отличается от нужного
+    changed = [index for index, dtype in enumerate(dtypes) if df.dtypes.iloc[index] != dtype]
+    if not changed:
+        return df
+    df = df.copy(deep=False)
+    for index in changed:
+        df.isetitem(index, df.iloc[:, index].astype(dtypes[index]))
+    return df
+
+def write_json_records(file_path, records, profile='pretty', chunk_size=DEFAULT_CHUNK_SIZE, dtypes=None):
+    """
+    Записывает записи в файл в выбранном профиле (файлы .gz и .xz сжимаются)
+
+    Args:
+        file_path (str/Path): Путь к выходному файлу
+        records (iterable/DataFrame): Записи (dict) или DataFrame
+        profile (str): Профиль вывода из JSON_PROFILES
+        chunk_size (int): Число записей в порции
+        dtypes (list): Типы столбцов DataFrame для записи (см.
+            JsonRecordWriter.write_dataframe)
+
+    Returns:
+        dict: {'records': число записей, 'bytes': число записанных байт
+            (до сжатия)}
+    """
+    with open_json_file(file_path, 'w') as f:
+        with JsonRecordWriter(f, profile, chunk_size) as writer:
+            if hasattr(records, 'to_json'):
+                writer.write_dataframe(records, dtypes)
+            else:
+                writer.write_records(records)
+    return {'records': writer.records, 'bytes': writer.bytes_written}
+
+def temporary_path(file_path):
+    """
+    Уникальное имя временного файла рядом с file_path: .<случайная часть>.<имя>.tmp
+
+    Параллельные процессы (и пересекающиеся запуски) получают разные имена
+    и не пишут в один временный файл; точка в начале скрывает файл от
+    поиска входных файлов, а расширения сжатия сохраняются.
+    """
+    file_path = Path(file_path)
+    return file_path.with_name(f".{os.getpid()}-{uuid.uuid4().hex[:12]}.{file_path.name}.tmp")
+
+def write_json_atomic(file_path, records, profile='pretty', chunk_size=DEFAULT_CHUNK_SIZE, dtypes=None):
+    """
+    Записывает записи во временный файл (temporary_path) и заменяет им
+    выходной файл через os.replace
+
+    Читатель всегда видит либо прежний, либо полностью записанный файл,
+    даже если запись прервана или несколько процессов пишут один и тот же
+    файл одновременно (остается результат последнего).
+
+    Returns:
+        dict: Результат write_json_records
+    """
+    tmp_path = temporary_path(file_path)
+    try:
+        written = write_json_records(tmp_path, records, profile, chunk_size, dtypes)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    os.replace(tmp_path, file_path)
+    return written
+
+def iter_json_records(file_path, buffer_size=64 * 1024):
+    """
+    Читает записи из JSON массива или JSON Lines по одной
+
+    Файл читается блоками по buffer_size символов, поэтому память не
+    зависит от числа записей (в отличие от json.load). Сжатые файлы
+    распаковываются потоком. Элементы массива должны быть объектами.
+
+    Args:
+        file_path (str/Path): Путь к файлу
+        buffer_size (int): Размер блока чтения
+
+    Yields:
+        dict: Записи файла
+    """
+    with open_json_file(file_path, 'r') as f:
+        if is_json_lines(file_path):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+            return
+
+        decoder = json.JSONDecoder()
+        buffer = ''
+        position = 0
+        # Что ожидается дальше: '[' в начале, запись (или ']' у пустого
+        # массива), затем ',' или ']'
+        state = 'start'
+
+        while True:
+            while position < len(buffer) and buffer[position].isspace():
+                position += 1
+            if position == len(buffer):
+                buffer, position = f.read(buffer_size), 0
+                if not buffer:
+                    raise ValueError(f"Неожиданный конец JSON файла {file_path}")
+                continue
+
+            char = buffer[position]
+            if state == 'start':
+                if char != '[':
+                    raise ValueError(f"JSON файл {file_path} не содержит массив записей")
+                position += 1
+                state = 'first'
+                continue
+            if char == ']' and state in ('first', 'next'):
+                return
+            if state == 'next':
+                if char != ',':
+                    raise ValueError(f"Ошибка разбора JSON файла {file_path}")
+                position += 1
+                state = 'record'
+                continue
+
+            # Запись может не помещаться в буфер - дочитываем, пока она не разберется
+            while True:
+                try:
+                    record, position = decoder.raw_decode(buffer, position)
+                    break
+                except json.JSONDecodeError:
+                    chunk = f.read(buffer_size)
+                    if not chunk:
+                        raise
+                    buffer, position = buffer[position:] + chunk, 0
+            yield record
+            state = 'next'
+
+            # Разобранная часть буфера больше не нужна
+            if position >= buffer_size:
+                buffer, position = buffer[position:], 0
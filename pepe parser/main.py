@@ -1,11 +1,17 @@
+import os
 import sys
+import time
 from pathlib import Path
-from excel_parser import xls_to_json_batch, xls_to_json_single
-from analyzer import perform_abc_xyz_analysis, analyze_folder
+from excel_parser import INPUT_SUFFIXES, xls_to_json_batch, xls_to_json_single
+from analyzer import analysis_projection, perform_abc_xyz_analysis, analyze_folder
 
-def main():
+def main(group_by=None):
     """
     Основная программа: парсит Excel файлы и выполняет ABC-XYZ анализ
+    
+    Args:
+        group_by (str/list): Столбцы группировки анализа (категория, склад,
+            регион); парсер сохраняет их вместе со столбцами анализа
     """
     # Папки по умолчанию
     input_excel_folder = "input_excel"
@@ -23,7 +29,10 @@ def main():
         results = xls_to_json_batch(
             input_folder=input_excel_folder,
             output_folder=output_json_folder,
-            sheet_name=0
+            sheet_name=0,
+            incremental=True,
+            typed_schema=True,
+            projection=analysis_projection(group_by)
         )
         
         if not results:
@@ -35,13 +44,40 @@ def main():
         print("СВОДКА ПАРСИНГА:")
         print("=" * 50)
         
-        for result in results:
+        converted = [result for result in results if 'error' not in result and not result.get('deferred')]
+        deferred = [result for result in results if result.get('deferred')]
+        failed = [result for result in results if 'error' in result]
+        
+        for result in converted:
             print(f"\nФайл: {Path(result['input']).name}")
+            print(f"  • Лист: {result['sheet']}")
             print(f"  • Строк: {result['rows']}")
             print(f"  • Столбцов: {result['columns']}")
             print(f"  • JSON: {Path(result['output']).name}")
+            if result.get('skipped'):
+                print("  • Без изменений с прошлого запуска")
+            elif result.get('linked_from'):
+                print(f"  • Дубликат файла: {Path(result['linked_from']).name}")
+            peak_rss = result.get('peak_memory', {}).get('peak_rss_bytes')
+            if peak_rss and not result.get('skipped'):
+                print(f"  • Пиковая память: {peak_rss / 1024 / 1024:.1f} МБ")
+        
+        for result in deferred:
+            plan = result['memory_plan']
+            print(f"\n⚠ Файл отложен: {Path(result['input']).name}")
+            print(f"  • Оценка памяти: {plan['estimated_bytes'] / 1024 / 1024:.0f} МБ "
+                  f"больше всего бюджета ({plan['budget_bytes'] / 1024 / 1024:.0f} МБ)")
+            print("  • Файл не сконвертирован: нужен больший бюджет памяти")
         
-        print(f"\n✓ Всего обработано файлов: {len(results)}")
+        for result in failed:
+            print(f"\n✗ Файл: {Path(result['input']).name}")
+            print(f"  • Ошибка: {result['error']}")
+        
+        print(f"\n✓ Всего обработано файлов: {len(converted)}")
+        if deferred:
+            print(f"⚠ Не сконвертировано (оценка памяти больше бюджета): {len(deferred)}")
+        if failed:
+            print(f"✗ Файлов с ошибками: {len(failed)}")
         print(f"✓ JSON файлы сохранены в папке: {output_json_folder}")
         
         # Шаг 2: ABC-XYZ анализ
@@ -49,7 +85,7 @@ def main():
         print("-" * 40)
         
         # Анализируем все JSON файлы в папке
-        analysis_results = analyze_folder(output_json_folder)
+        analysis_results = analyze_folder(output_json_folder, group_by=group_by)
         
         if analysis_results:
             print("\n" + "=" * 50)
@@ -69,23 +105,26 @@ def main():
     except Exception as e:
         print(f"Произошла ошибка: {e}")
 
-def process_single_file(excel_file_path):
+def process_single_file(excel_file_path, output_folder="output_json_single", group_by=None):
     """
-    Обработка одного Excel файла: парсинг + анализ
+    Обработка одного Excel файла: парсинг + анализ (group_by - см. main)
     """
     try:
         # Парсинг одного файла
         print(f"Обработка файла: {Path(excel_file_path).name}")
         json_result = xls_to_json_single(
             input_file=excel_file_path,
-            output_folder="output_json_single"
+            output_folder=output_folder,
+            typed_schema=True,
+            projection=analysis_projection(group_by)
         )
         
         if json_result:
             # Анализ полученного JSON файла
             analysis_result = perform_abc_xyz_analysis(
                 json_file_path=json_result['output'],
-                output_file_name=f"{Path(excel_file_path).stem}_analysis.json"
+                output_file_name=f"{Path(excel_file_path).stem}_analysis.json",
+                group_by=group_by
             )
             
             if analysis_result:
@@ -97,9 +136,91 @@ def process_single_file(excel_file_path):
     
     return None
 
+def _scan_excel_files(folder):
+    """
+    Снимок папки: {путь: (размер, время изменения)} для XLS/XLSX/CSV файлов.
+    Временные файлы Excel (~$имя.xlsx) пропускаются.
+    """
+    snapshot = {}
+    for entry in os.scandir(folder):
+        name = entry.name
+        if name.startswith('~$') or not name.lower().endswith(INPUT_SUFFIXES):
+            continue
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            # Файл удален между чтением папки и stat
+            continue
+        snapshot[entry.path] = (stat.st_size, stat.st_mtime)
+    return snapshot
+
+def watch_folder(input_folder="input_excel", output_folder="output_json", interval=2.0, settle=3.0):
+    """
+    Режим демона: следит за папкой и обрабатывает новые и измененные файлы
+    
+    Папка опрашивается каждые interval секунд (только stat, без чтения файлов).
+    Файл обрабатывается (парсинг + анализ), когда его размер и время изменения
+    не менялись не меньше settle секунд - то есть запись файла завершена.
+    Интерпретатор и pandas загружаются один раз на все время работы.
+    Остановка - Ctrl+C.
+    
+    Args:
+        input_folder (str): Папка, в которую поступают Excel файлы
+        output_folder (str): Папка для JSON файлов и результатов анализа
+        interval (float): Период опроса папки, секунд
+        settle (float): Сколько секунд файл должен оставаться неизменным
+    """
+    input_path = Path(input_folder)
+    if not input_path.exists():
+        raise FileNotFoundError(f"Папка {input_folder} не найдена!")
+    
+    # Движок чтения XLSX загружается заранее, а не при первом файле
+    try:
+        import openpyxl  # noqa: F401
+    except ImportError:
+        pass
+    
+    print(f"Наблюдение за папкой {input_folder} (опрос каждые {interval} с, Ctrl+C - выход)")
+    
+    # путь -> (размер, mtime, момент, с которого файл не меняется)
+    observed = {}
+    # путь -> (размер, mtime) последней обработанной версии
+    processed = {}
+    
+    try:
+        while True:
+            now = time.monotonic()
+            snapshot = _scan_excel_files(input_path)
+            
+            for path, state in snapshot.items():
+                previous = observed.get(path)
+                if previous is None or previous[:2] != state:
+                    # Новый файл или запись еще идет - отсчет начинается заново
+                    observed[path] = (*state, now)
+                    continue
+                
+                if processed.get(path) == state or now - previous[2] < settle:
+                    continue
+                
+                print(f"\n→ Обнаружен новый или измененный файл: {Path(path).name}")
+                process_single_file(path, output_folder)
+                processed[path] = state
+            
+            # Удаленные файлы забываются (при повторном появлении обработаются снова)
+            for path in set(observed) - set(snapshot):
+                observed.pop(path, None)
+                processed.pop(path, None)
+            
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print("\nНаблюдение остановлено")
+
 if __name__ == "__main__":
     # Проверяем аргументы командной строки
-    if len(sys.argv) > 1:
+    if len(sys.argv) > 1 and sys.argv[1] == "--watch":
+        # Режим демона: python main.py --watch [папка Excel] [папка JSON]
+        watch_folder(*sys.argv[2:4])
+    elif len(sys.argv) > 1:
         # Если передан аргумент - путь к файлу
         file_path = sys.argv[1]
         process_single_file(file_path)
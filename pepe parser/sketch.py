@@ -0,0 +1,223 @@
+import json
+import math
+from pathlib import Path
+from analyzer import ABC_THRESHOLDS, _iter_normalized
+from json_io import iter_json_records
+
+# Приближенный ABC анализ: относительная ширина логарифмических корзин выручки
+SKETCH_ACCURACY = 0.01
+
+class RevenueSketch:
+    """
+    Сжатое описание распределения выручки для приближенного ABC анализа
+    
+    Положительная выручка раскладывается по логарифмическим корзинам
+    (gamma^(i-1), gamma^i], gamma = (1 + a) / (1 - a), a - относительная
+    точность; в корзине хранятся число товаров и их суммарная выручка.
+    Память зависит только от диапазона значений (около
+    log(max / min) / log(gamma) корзин), а не от числа товаров, поэтому
+    поток записей любой длины обрабатывается за один проход. Описания с
+    одинаковой точностью объединяются (merge) - например, по разным файлам.
+    
+    Граница класса лежит в корзине, в которой накопленная доля выручки
+    переходит порог ABC_THRESHOLDS: все товары корзин выше нее относятся к
+    классу, все товары корзин ниже - нет. В этой корзине находится первый
+    товар, не вошедший в класс, поэтому cutoffs() возвращает интервал
+    корзины (gamma^(i-1), gamma^i] и оценку границы - середину корзины.
+    Относительная ошибка оценки не больше a по отношению к выручке этого
+    товара, но не к минимальной выручке класса: последний товар класса
+    может лежать в корзине выше (ошибка до ~3a), а если между корзинами
+    нет товаров - сколь угодно выше (любое значение между ними тоже точная
+    граница). Ошибиться с классом можно только для товаров из корзины
+    границы; их суммарная доля выручки возвращается как share_error.
+    
+    Пример:
+        sketch = RevenueSketch()
+        for revenue in revenues:
+            sketch.add(revenue)
+        sketch.merge(other_sketch)
+        print(sketch.cutoffs())
+    """
+    
+    def __init__(self, relative_accuracy=SKETCH_ACCURACY):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("Относительная точность должна быть в интервале (0, 1)")
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        # Индекс корзины -> [число товаров, суммарная выручка]
+        self.buckets = {}
+        # Нулевая и отрицательная выручка всегда в конце сортировки
+        self.nonpositive_count = 0
+        self.nonpositive_revenue = 0
+    
+    @property
+    def count(self):
+        return sum(bucket[0] for bucket in self.buckets.values()) + self.nonpositive_count
+    
+    @property
+    def total_revenue(self):
+        return sum(bucket[1] for bucket in self.buckets.values()) + self.nonpositive_revenue
+    
+    def add(self, revenue):
+        """
+        Добавляет выручку одного товара
+        """
+        if revenue > 0:
+            bucket = self.buckets.setdefault(math.ceil(math.log(revenue) / self._log_gamma), [0, 0])
+            bucket[0] += 1
+            bucket[1] += revenue
+        else:
+            self.nonpositive_count += 1
+            self.nonpositive_revenue += revenue
+    
+    def merge(self, other):
+        """
+        Добавляет к описанию другое описание с той же точностью
+        """
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Объединять можно только описания с одинаковой точностью")
+        for index, (count, revenue) in other.buckets.items():
+            bucket = self.buckets.setdefault(index, [0, 0])
+            bucket[0] += count
+            bucket[1] += revenue
+        self.nonpositive_count += other.nonpositive_count
+        self.nonpositive_revenue += other.nonpositive_revenue
+        return self
+    
+    def _bucket_value(self, index):
+        # Середина корзины: относительная ошибка для любого значения корзины не больше a
+        return 2 * self.gamma ** index / (self.gamma + 1)
+    
+    def cutoffs(self):
+        """
+        Приближенные границы классов ABC по выручке
+        
+        Returns:
+            dict: {'A', 'B': оценки минимальной выручки классов A и B
+                (середины корзин границ), 'intervals': {'A', 'B': интервал
+                (нижняя граница, верхняя граница] корзины границы - в нем
+                лежит выручка первого товара, не вошедшего в класс},
+                'count', 'total_revenue', 'relative_error': a - ошибка
+                оценки относительно выручки этого товара, 'share_error':
+                доля выручки (%) товаров, класс которых может быть
+                определен неверно} или None, если общая выручка не больше 0
+        """
+        total_revenue = self.total_revenue
+        if total_revenue <= 0:
+            return None
+        
+        result = {'count': self.count, 'total_revenue': total_revenue, 'intervals': {},
+                  'relative_error': self.relative_accuracy, 'share_error': 0}
+        cumulative = 0
+        thresholds = iter(zip('AB', ABC_THRESHOLDS))
+        group, threshold = next(thresholds)
+        
+        for index in sorted(self.buckets, reverse=True):
+            revenue = self.buckets[index][1]
+            share = (cumulative + revenue) / total_revenue * 100
+            # Корзина, в которой накопленная доля переходит порог, содержит границу
+            while group and share > threshold:
+                result[group] = self._bucket_value(index)
+                result['intervals'][group] = (self.gamma ** (index - 1), self.gamma ** index)
+                result['share_error'] = max(result['share_error'], revenue / total_revenue * 100)
+                group, threshold = next(thresholds, (None, None))
+            cumulative += revenue
+        
+        # Порог не перейден положительной выручкой (отрицательная выручка уменьшает итог)
+        while group:
+            result[group] = 0
+            result['intervals'][group] = (0, 0)
+            group, threshold = next(thresholds, (None, None))
+        
+        return result
+    
+    def abc_class(self, revenue, cutoffs=None):
+        """
+        Приближенный класс ABC товара по его выручке
+        """
+        cutoffs = cutoffs or self.cutoffs()
+        if revenue >= cutoffs['A'] and revenue > 0:
+            return 'A'
+        elif revenue >= cutoffs['B'] and revenue > 0:
+            return 'B'
+        return 'C'
+    
+    def to_dict(self):
+        """
+        Описание в виде словаря для сохранения в JSON
+        """
+        return {
+            'relative_accuracy': self.relative_accuracy,
+            'buckets': [[index, count, revenue] for index, (count, revenue) in sorted(self.buckets.items())],
+            'nonpositive': [self.nonpositive_count, self.nonpositive_revenue]
+        }
+    
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Восстанавливает описание из словаря to_dict()
+        """
+        sketch = cls(data['relative_accuracy'])
+        sketch.buckets = {index: [count, revenue] for index, count, revenue in data['buckets']}
+        sketch.nonpositive_count, sketch.nonpositive_revenue = data['nonpositive']
+        return sketch
+
+def sketch_revenue(json_file_path, relative_accuracy=SKETCH_ACCURACY):
+    """
+    Строит описание распределения выручки файла за один потоковый проход
+    
+    Args:
+        json_file_path (str): Путь к JSON или JSON Lines файлу с данными
+            (в том числе сжатому)
+        relative_accuracy (float): Относительная точность корзин (см. RevenueSketch)
+    
+    Returns:
+        RevenueSketch: Описание распределения выручки
+    """
+    sketch = RevenueSketch(relative_accuracy)
+    for item in _iter_normalized(iter_json_records(json_file_path)):
+        sketch.add(item['revenue'])
+    return sketch
+
+def approximate_abc(json_file_paths, relative_accuracy=SKETCH_ACCURACY):
+    """
+    Приближенный ABC анализ одного или нескольких файлов без сортировки
+    
+    Каждый файл читается потоком один раз, описания файлов объединяются,
+    и по общему описанию определяются границы классов A и B по выручке
+    (см. RevenueSketch).
+    
+    Args:
+        json_file_paths (str/list): Путь к файлу с данными или список путей
+        relative_accuracy (float): Относительная точность корзин (см. RevenueSketch)
+    
+    Returns:
+        dict: Результат RevenueSketch.cutoffs() или None в случае ошибки
+    """
+    if isinstance(json_file_paths, (str, Path)):
+        json_file_paths = [json_file_paths]
+    
+    try:
+        sketch = RevenueSketch(relative_accuracy)
+        for json_file_path in json_file_paths:
+            sketch.merge(sketch_revenue(json_file_path, relative_accuracy))
+        
+        cutoffs = sketch.cutoffs()
+        if cutoffs is None:
+            print("⚠ Общая выручка равна 0, ABC анализ невозможен!")
+            return None
+        
+        print(f"\nПриближенный ABC анализ: {cutoffs['count']} товаров, {len(json_file_paths)} файлов")
+        for group in 'AB':
+            low, high = cutoffs['intervals'][group]
+            print(f"  • Класс {group}: выручка от {cutoffs[group]:.2f} (граница в ({low:.2f}, {high:.2f}])")
+        print(f"  • Доля выручки с неточным классом: {cutoffs['share_error']:.2f}%")
+        return cutoffs
+        
+    except FileNotFoundError as e:
+        print(f"✗ Файл {e.filename} не найден!")
+        return None
+    except (json.JSONDecodeError, ValueError) as e:
+        print(f"✗ Ошибка чтения JSON файла: {e}")
+        return None
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Модули парсера лежат рядом с папкой tests и импортируются без пакета (как в main.py)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,94 @@
+import random
+from analyzer import _classify_loop
+from incremental import (IncrementalAbcXyz, _NO_BOUNDARY, _TreapNode, _treap_build, _treap_merge,
+                         _treap_range, _treap_split)
+
+def _inorder(node):
+    return list(_treap_range(node, _NO_BOUNDARY, (float('inf'), float('inf'))))
+
+def _check_sums(node):
+    if node is None:
+        return 0
+    total = _check_sums(node.left) + node.revenue + _check_sums(node.right)
+    assert node.sum == total
+    return total
+
+def test_treap_matches_sorted_list():
+    """
+    Вставка, удаление и выборка диапазона совпадают со списком, отсортированным заново
+    """
+    rng = random.Random(1)
+    reference = []
+    root = None
+    
+    for sequence in range(2000):
+        if reference and rng.random() < 0.4:
+            key = reference.pop(rng.randrange(len(reference)))
+            left, right = _treap_split(root, key)
+            left, _ = _treap_split(left, (key[0], key[1] - 1))
+            root = _treap_merge(left, right)
+        else:
+            revenue = rng.randint(0, 50)
+            node = _TreapNode((-revenue, sequence), revenue)
+            left, right = _treap_split(root, node.key)
+            root = _treap_merge(_treap_merge(left, node), right)
+            reference.append(node.key)
+        reference.sort()
+        
+        if sequence % 50 == 0:
+            assert [node.key for node in _inorder(root)] == reference
+            assert _check_sums(root) == sum(-key[0] for key in reference)
+            low, high = sorted(rng.sample(range(-60, 5), 2))
+            expected = [key for key in reference if (low, 0) < key <= (high, 0)]
+            assert [node.key for node in _treap_range(root, (low, 0), (high, 0))] == expected
+
+def test_treap_build_matches_inserts():
+    rng = random.Random(2)
+    keys = sorted((-rng.randint(0, 100), sequence) for sequence in range(500))
+    root = _treap_build([_TreapNode(key, -key[0]) for key in keys])
+    assert [node.key for node in _inorder(root)] == keys
+    assert _check_sums(root) == sum(-key[0] for key in keys)
+    assert _treap_build([]) is None
+
+def _full_classes(analysis):
+    # Полный пересчет движком 'loop' по текущим товарам в порядке добавления
+    items = [{'id': item_id, 'name': state['name'], 'revenue': state['revenue'],
+              'quarters': list(state['quarters'])} for item_id, state in analysis.items()]
+    return {item['id']: item['ABC_XYZ'] for item in _classify_loop(items) or []}
+
+def test_incremental_matches_full_recalculation():
+    """
+    После случайных изменений классы совпадают с полным пересчетом
+    """
+    rng = random.Random(3)
+    current = {}
+    
+    def random_item():
+        return rng.randint(0, 1000), [rng.randint(0, 300) for _ in range(4)]
+    
+    for item_id in range(200):
+        revenue, quarters = random_item()
+        current[item_id] = {'name': f"Товар {item_id}", 'revenue': revenue, 'quarters': quarters}
+    analysis = IncrementalAbcXyz({'id': item_id, **state} for item_id, state in current.items())
+    assert {item_id: analysis.classify(item_id) for item_id in current} == _full_classes(current)
+    
+    for step in range(500):
+        action = rng.random()
+        if action < 0.2 and len(current) > 1:
+            item_id = rng.choice(list(current))
+            del current[item_id]
+            analysis.remove(item_id)
+        else:
+            item_id = rng.randrange(300)
+            revenue, quarters = random_item()
+            if item_id in current:
+                current[item_id].update(revenue=revenue, quarters=quarters)
+            else:
+                current[item_id] = {'name': f"Товар {item_id}", 'revenue': revenue, 'quarters': quarters}
+            analysis.upsert(item_id, revenue, quarters, current[item_id]['name'])
+        
+        if step % 25 == 0:
+            assert {item_id: analysis.classify(item_id) for item_id in current} == _full_classes(current)
+    
+    results = list(analysis.results())
+    assert [item['revenue'] for item in results] == sorted(state['revenue'] for state in current.values())[::-1]
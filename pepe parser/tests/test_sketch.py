@@ -0,0 +1,65 @@
+import random
+import pytest
+from analyzer import ABC_THRESHOLDS
+from sketch import RevenueSketch
+
+def _revenues(rng, count):
+    return [rng.lognormvariate(7, 1.5) for _ in range(count)]
+
+def _first_outside(revenues, threshold):
+    # Выручка первого товара (по убыванию выручки), не вошедшего в класс
+    total_revenue = sum(revenues)
+    cumulative = 0
+    for revenue in sorted(revenues, reverse=True):
+        cumulative += revenue
+        if cumulative / total_revenue * 100 > threshold:
+            return revenue
+
+@pytest.mark.parametrize('relative_accuracy', [0.001, 0.01, 0.05])
+def test_cutoffs_within_relative_error(relative_accuracy):
+    """
+    Граница класса отличается от выручки первого товара вне класса не
+    больше чем на relative_accuracy, и эта выручка лежит в интервале корзины
+    """
+    rng = random.Random(4)
+    for _ in range(20):
+        revenues = _revenues(rng, rng.randint(10, 3000))
+        sketch = RevenueSketch(relative_accuracy)
+        for revenue in revenues:
+            sketch.add(revenue)
+        cutoffs = sketch.cutoffs()
+        
+        assert cutoffs['count'] == len(revenues)
+        assert cutoffs['relative_error'] == relative_accuracy
+        for group, threshold in zip('AB', ABC_THRESHOLDS):
+            revenue = _first_outside(revenues, threshold)
+            low, high = cutoffs['intervals'][group]
+            assert low < revenue <= high
+            assert abs(cutoffs[group] - revenue) <= relative_accuracy * revenue
+
+def test_merge_equals_single_pass():
+    rng = random.Random(5)
+    parts = [_revenues(rng, rng.randint(0, 500)) + [0, -rng.random()] for _ in range(5)]
+    
+    merged = RevenueSketch()
+    for part in parts:
+        sketch = RevenueSketch()
+        for revenue in part:
+            sketch.add(revenue)
+        merged.merge(sketch)
+    
+    single = RevenueSketch()
+    for revenue in (revenue for part in parts for revenue in part):
+        single.add(revenue)
+    
+    assert merged.buckets.keys() == single.buckets.keys()
+    for index, (count, revenue) in single.buckets.items():
+        assert merged.buckets[index][0] == count
+        assert merged.buckets[index][1] == pytest.approx(revenue)
+    assert merged.nonpositive_count == single.nonpositive_count
+    assert merged.cutoffs()['A'] == single.cutoffs()['A']
+    assert RevenueSketch.from_dict(merged.to_dict()).to_dict() == merged.to_dict()
+
+def test_merge_rejects_other_accuracy():
+    with pytest.raises(ValueError):
+        RevenueSketch(0.01).merge(RevenueSketch(0.02))
@@ -0,0 +1,32 @@
+import json
+import pytest
+from analyzer import (ANALYSIS_ENGINES, ID_COLUMN, NAME_COLUMN, QUARTER_COLUMNS, REVENUE_COLUMN,
+                      RunningVariance, perform_abc_xyz_analysis)
+from incremental import IncrementalAbcXyz
+from period_matrix import PeriodMatrix
+
+# CV ровно 25% (граница Y/Z): два прохода дают 25.0, алгоритм Уэлфорда -
+# 25.000000000000007
+BOUNDARY_QUARTERS = [1070, 990, 770, 530]
+
+def test_running_variance_cv_on_boundary():
+    assert RunningVariance().update(BOUNDARY_QUARTERS).cv() == pytest.approx(25.0)
+    assert RunningVariance().update(BOUNDARY_QUARTERS).xyz_class() == 'Y'
+
+@pytest.mark.parametrize('engine', ANALYSIS_ENGINES)
+def test_boundary_cv_is_y_in_every_engine(tmp_path, engine):
+    record = {ID_COLUMN: 1, NAME_COLUMN: 'Товар', REVENUE_COLUMN: sum(BOUNDARY_QUARTERS),
+              **dict(zip(QUARTER_COLUMNS, BOUNDARY_QUARTERS))}
+    data_path = tmp_path / 'data.json'
+    data_path.write_text(json.dumps([record], ensure_ascii=False), encoding='utf-8')
+    
+    result_path = perform_abc_xyz_analysis(str(data_path), engine=engine)
+    with open(result_path, encoding='utf-8') as f:
+        assert [item['XYZ'] for item in json.load(f)] == ['Y']
+
+def test_boundary_cv_is_y_in_incremental_and_period_matrix(tmp_path):
+    items = [{'id': 1, 'name': 'Товар', 'revenue': sum(BOUNDARY_QUARTERS), 'quarters': BOUNDARY_QUARTERS}]
+    assert IncrementalAbcXyz(items).classify(1)[1] == 'Y'
+    
+    store = PeriodMatrix.create(tmp_path / 'store', [1], ['Товар'], [[value] for value in BOUNDARY_QUARTERS])
+    assert store.xyz_classes() == {1: 'Y'}